@@ -1,17 +1,38 @@
-from flask import Flask, request, jsonify
+import json
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
-from scheduler import ShiftlyScheduler
+from scheduler import ShiftlyScheduler, validate_schedule
+from jobs import QueueFullError, create_job_queue
+from batch import iter_batch
+from cache import canonical_key, create_result_cache
+from metrics import solve_metrics
 
 app = Flask(__name__)
 CORS(app)
 
+# The Next.js caller gives up after about a minute, so no solve may run longer
+MAX_SOLVE_SECONDS = 55
+
+# Background solves for /jobs; long jobs don't have to finish within the HTTP timeout
+JOB_MAX_SOLVE_SECONDS = 300
+
+# Sites per /schedule/batch request; each site is its own solve
+MAX_BATCH_SITES = 50
+result_cache = create_result_cache()
+job_queue = create_job_queue(result_cache)
+
 @app.route('/')
 def home():
     return jsonify({'status': 'Shiftly Scheduler API', 'version': '1.0'})
 
 @app.route('/health')
 def health():
-    return jsonify({'status': 'healthy'})
+    return jsonify({'status': 'healthy', 'cache': result_cache.stats()})
+
+@app.route('/metrics')
+def metrics():
+    body = solve_metrics.render(cache_stats=result_cache.stats())
+    return Response(body, mimetype='text/plain; version=0.0.4')
 
 @app.route('/schedule', methods=['POST'])
 def schedule():
@@ -21,14 +42,150 @@ def schedule():
         if not data:
             return jsonify({'success': False, 'error': 'No data provided'}), 400
         
+        timeout = min(float(data.get('timeout_seconds', MAX_SOLVE_SECONDS)), MAX_SOLVE_SECONDS)
+        
+        cache_key = canonical_key(data)
+        cached = result_cache.get(cache_key)
+        if cached is not None:
+            solve_metrics.observe_cache_hit('schedule')
+            response = jsonify(cached)
+            response.headers['X-Cache'] = 'HIT'
+            return response
+        
         scheduler = ShiftlyScheduler(data)
-        result = scheduler.solve(timeout_seconds=60)
+        result = scheduler.solve(timeout_seconds=timeout)
+        solve_metrics.observe(result, 'schedule')
+        result_cache.put(cache_key, result)
+        
+        response = jsonify(result)
+        response.headers['X-Cache'] = 'MISS'
+        return response
+    
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/schedule/stream', methods=['POST'])
+def schedule_stream():
+    data = request.get_json(silent=True)
+    
+    if not data:
+        return jsonify({'success': False, 'error': 'No data provided'}), 400
+    
+    # Bad input fails as JSON here, before the stream starts
+    try:
+        timeout = min(float(data.get('timeout_seconds', MAX_SOLVE_SECONDS)), MAX_SOLVE_SECONDS)
+        scheduler = ShiftlyScheduler(data)
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({'success': False, 'error': f'Invalid request: {e}'}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+    
+    # Server-Sent Events for EventSource clients, NDJSON for everything else
+    use_sse = 'text/event-stream' in request.headers.get('Accept', '')
+    
+    def generate():
+        # Closing this generator (client went away) also cancels the solve
+        for event in scheduler.iter_solve(timeout_seconds=timeout):
+            if event['event'] == 'result':
+                solve_metrics.observe(event, 'schedule_stream')
+            if use_sse:
+                yield f"event: {event['event']}\ndata: {json.dumps(event)}\n\n"
+            else:
+                yield json.dumps(event) + '\n'
+    
+    mimetype = 'text/event-stream' if use_sse else 'application/x-ndjson'
+    return Response(generate(), mimetype=mimetype, headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+# Solves { sites: [payload, ...], timeout_seconds? } over a process pool and
+# streams one NDJSON line per site as it finishes, then a 'done' summary.
+@app.route('/schedule/batch', methods=['POST'])
+def schedule_batch():
+    data = request.get_json(silent=True)
+    
+    if not data or not data.get('sites'):
+        return jsonify({'success': False, 'error': 'No sites provided'}), 400
+    if len(data['sites']) > MAX_BATCH_SITES:
+        return jsonify({'success': False, 'error': f'At most {MAX_BATCH_SITES} sites per batch'}), 400
+    
+    timeout = min(float(data.get('timeout_seconds', MAX_SOLVE_SECONDS)), MAX_SOLVE_SECONDS)
+    
+    def generate():
+        for event in iter_batch(data['sites'], timeout_seconds=timeout, result_cache=result_cache):
+            if event['event'] == 'site':
+                if event['cached']:
+                    solve_metrics.observe_cache_hit('schedule_batch')
+                else:
+                    solve_metrics.observe(event, 'schedule_batch')
+            yield json.dumps(event) + '\n'
+    
+    return Response(generate(), mimetype='application/x-ndjson', headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+# Checks existing rotas against the rules without solving. Accepts
+# { schedule, rules, staff? } or a batch { rotas: [{ schedule, rules?, staff? }], rules?, staff? }
+# where top-level rules/staff apply to every rota that doesn't set its own.
+@app.route('/validate', methods=['POST'])
+def validate():
+    try:
+        data = request.get_json()
+        
+        if not data:
+            return jsonify({'success': False, 'error': 'No data provided'}), 400
+        
+        if 'rotas' in data:
+            results = []
+            for rota in data['rotas']:
+                results.append({
+                    'rule_compliance': validate_schedule(
+                        rota['schedule'],
+                        rota.get('rules', data.get('rules', [])),
+                        rota.get('staff', data.get('staff')),
+                    )
+                })
+            return jsonify({'success': True, 'results': results})
         
-        return jsonify(result)
+        if 'schedule' not in data:
+            return jsonify({'success': False, 'error': 'No schedule provided'}), 400
+        
+        rule_compliance = validate_schedule(data['schedule'], data.get('rules', []), data.get('staff'))
+        return jsonify({'success': True, 'rule_compliance': rule_compliance})
     
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({'success': False, 'error': f'Invalid schedule: {e}'}), 400
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@app.route('/jobs', methods=['POST'])
+def create_job():
+    try:
+        data = request.get_json()
+        
+        if not data:
+            return jsonify({'success': False, 'error': 'No data provided'}), 400
+        
+        timeout = min(float(data.get('timeout_seconds', MAX_SOLVE_SECONDS)), JOB_MAX_SOLVE_SECONDS)
+        job_id = job_queue.submit(data, timeout)
+        
+        return jsonify({'success': True, 'job_id': job_id, 'status': 'queued'}), 202
+    
+    except QueueFullError as e:
+        return jsonify({'success': False, 'error': str(e)}), 503
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Job not found'}), 404
+    return jsonify({'success': True, **job})
+
+@app.route('/jobs/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    job = job_queue.cancel(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Job not found'}), 404
+    return jsonify({'success': True, **job})
+
 if __name__ == '__main__':
     import os
     port = int(os.environ.get('PORT', 10000))
@@ -0,0 +1,84 @@
+"""Solve many independent rotas (e.g. every site of a multi-site customer) at once."""
+
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from cache import canonical_key
+from scheduler import ShiftlyScheduler
+from tuning import available_cores
+
+
+def plan_pool(site_count, cores=None, max_processes=None):
+    """(processes, CP-SAT workers per solve) for a batch of site_count solves."""
+    cores = cores or available_cores()
+    processes = max(1, min(site_count, cores, max_processes or cores))
+    return processes, max(1, cores // processes)
+
+
+def solve_site(data, timeout_seconds, search_workers):
+    """Pool entry point; runs in a worker process."""
+    try:
+        scheduler = ShiftlyScheduler(data)
+        scheduler.search_workers = search_workers
+        return scheduler.solve(timeout_seconds=timeout_seconds)
+    except Exception as e:
+        return {'success': False, 'error': str(e)}
+
+
+def iter_batch(sites, timeout_seconds, result_cache=None, max_processes=None):
+    """Solve every site payload, yielding {'event': 'site', 'index', 'site_id', ...result}."""
+    started = time.monotonic()
+    succeeded = 0
+    pending = []
+    
+    def site_event(index, result, cached=False):
+        return {
+            'event': 'site',
+            'index': index,
+            'site_id': sites[index].get('site_id'),
+            'cached': cached,
+            **result,
+        }
+    
+    keys = [None] * len(sites)
+    for index, data in enumerate(sites):
+        if result_cache is not None:
+            keys[index] = canonical_key(data)
+            cached = result_cache.get(keys[index])
+            if cached is not None:
+                succeeded += 1
+                yield site_event(index, cached, cached=True)
+                continue
+        pending.append(index)
+    
+    if pending:
+        processes, search_workers = plan_pool(len(pending), max_processes=max_processes)
+        # spawn, not fork: forking a threaded server (or OR-tools) can deadlock the child
+        executor = ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context('spawn'))
+        try:
+            futures = {
+                executor.submit(solve_site, sites[index], timeout_seconds, search_workers): index
+                for index in pending
+            }
+            for future in as_completed(futures):
+                index = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = {'success': False, 'error': str(e)}
+                if result_cache is not None:
+                    result_cache.put(keys[index], result)
+                if result.get('success'):
+                    succeeded += 1
+                yield site_event(index, result)
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+    
+    yield {
+        'event': 'done',
+        'sites': len(sites),
+        'succeeded': succeeded,
+        'failed': len(sites) - succeeded,
+        'elapsed': round(time.monotonic() - started, 3),
+    }
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""Benchmark the scheduler on seeded synthetic rotas."""
+
+import argparse
+import json
+import multiprocessing
+import platform
+import random
+import statistics
+import sys
+import time
+
+from tuning import available_cores
+
+
+# name: (staff, weeks, multi_week_mode)
+CASES = {
+    'small-1w': (8, 1, 'sequential'),
+    'medium-2w': (20, 2, 'sequential'),
+    'medium-2w-joint': (20, 2, 'joint'),
+    'large-4w': (45, 4, 'sequential'),
+    'large-3w-joint': (30, 3, 'joint'),
+}
+
+DAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+# name, start, end, minutes
+SHIFT_TEMPLATES = [
+    ('Open', '07:00', '15:00', 480),
+    ('Mid', '11:00', '17:00', 360),
+    ('Close', '15:00', '23:00', 480),
+    ('Night', '22:00', '06:00', 480),
+]
+
+RULES = [
+    {'type': 'no_clopening', 'enabled': True},
+    {'type': 'max_consecutive_days', 'enabled': True, 'value': 5},
+    {'type': 'fair_weekend_distribution', 'enabled': True},
+    {'type': 'rest_between_shifts', 'enabled': True, 'value': 11},
+    {'type': 'minimum_days_off', 'enabled': True, 'value': 2},
+]
+
+
+def generate_payload(seed, staff_count, weeks=1, multi_week_mode='sequential'):
+    """A realistic, usually feasible rota request; the same seed gives the same payload."""
+    rng = random.Random(seed)
+
+    shifts = []
+    for day in DAYS:
+        for name, start, end, minutes in SHIFT_TEMPLATES:
+            # Nights only on some days, mids only on busy ones
+            if name == 'Night' and rng.random() < 0.5:
+                continue
+            if name == 'Mid' and day not in ('Friday', 'Saturday', 'Sunday') and rng.random() < 0.5:
+                continue
+            shifts.append({
+                'name': name,
+                'day': day,
+                'start_time': start,
+                'end_time': end,
+                'staff_required': max(1, round(staff_count / 10 * rng.uniform(0.6, 1.2))),
+            })
+
+    staff = []
+    for i in range(staff_count):
+        staff.append({
+            'id': f's{i}',
+            'name': f'Staff {i}',
+            'contracted_hours': rng.choice([16, 24, 32, 40]),
+            'max_hours': 48,
+            'availability': _availability(rng),
+        })
+
+    # Contracted hours (less the hour of slack the model allows) must fit in the demand
+    demand_hours = sum(
+        next(m for n, s, e, m in SHIFT_TEMPLATES if n == shift['name']) / 60 * shift['staff_required']
+        for shift in shifts
+    )
+    while sum(max(0, s['contracted_hours'] - 1) for s in staff) > demand_hours * 0.75:
+        member = max(staff, key=lambda s: (s['contracted_hours'], rng.random()))
+        member['contracted_hours'] -= 8
+
+    return {
+        'staff': staff,
+        'shifts': shifts,
+        'rules': RULES,
+        'weeks': weeks,
+        'multi_week_mode': multi_week_mode,
+    }
+
+
+def _availability(rng):
+    # Each staff member uses one of the three formats the API accepts
+    style = rng.choice(['boolean', 'am_pm', 'window'])
+    availability = {}
+    for day in DAYS:
+        key = day.lower()
+        off = rng.random() < 0.15
+        if style == 'boolean':
+            availability[key] = not off
+        elif style == 'am_pm':
+            availability[key] = {'AM': not off, 'PM': not off and rng.random() > 0.1}
+        elif off:
+            availability[key] = {'available': False}
+        elif rng.random() < 0.2:
+            availability[key] = {'available': True, 'start': '07:00', 'end': '17:00'}
+        else:
+            availability[key] = {'available': True}
+    return availability
+
+
+def run_case(payload, timeout_seconds):
+    """Solve one payload; runs in its own process so ru_maxrss is this solve's peak."""
+    from scheduler import ShiftlyScheduler, peak_rss_mb
+
+    started = time.perf_counter()
+    scheduler = ShiftlyScheduler(payload)
+    setup = time.perf_counter() - started
+    result = scheduler.solve(timeout_seconds=timeout_seconds)
+    total = time.perf_counter() - started
+
+    stats = result.get('stats', {})
+    phases = stats.get('phases', {})
+
+    return {
+        'success': result.get('success', False),
+        'total': round(total, 4),
+        'setup': round(setup, 4),
+        'preflight': phases.get('preflight', 0.0),
+        'build': phases.get('build', 0.0),
+        'search': phases.get('search', 0.0),
+        'diagnostics': phases.get('diagnostics', 0.0),
+        'format': phases.get('format', 0.0),
+        'validation': phases.get('validation', 0.0),
+        'branches': stats.get('branches', 0),
+        'conflicts': stats.get('conflicts', 0),
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def run_benchmark(cases, seed, repeat, timeout_seconds):
+    context = multiprocessing.get_context('spawn')
+    results = []
+    for case_index, name in enumerate(cases):
+        staff_count, weeks, mode = CASES[name]
+        payload = generate_payload(seed + case_index, staff_count, weeks, mode)
+        runs = []
+        for _ in range(repeat):
+            with context.Pool(1, maxtasksperchild=1) as pool:
+                runs.append(pool.apply(run_case, (payload, timeout_seconds)))
+        median = {key: statistics.median(run[key] for run in runs) for key in runs[0] if key != 'success'}
+        results.append({
+            'name': name,
+            'staff': staff_count,
+            'shifts': len(payload['shifts']),
+            'weeks': weeks,
+            'mode': mode,
+            'success': all(run['success'] for run in runs),
+            'median': median,
+            'runs': runs,
+        })
+        print(
+            f"{name:18} {'ok' if results[-1]['success'] else 'FAILED':6} "
+            f"total {median['total']:.3f}s  build {median['build']:.3f}s  search {median['search']:.3f}s  "
+            f"validation {median['validation']:.3f}s  rss {median['peak_rss_mb']:.0f}MB",
+            file=sys.stderr,
+        )
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Cases whose median total or search time grew by more than threshold (a fraction)."""
+    previous = {case['name']: case for case in baseline.get('cases', [])}
+    regressions = []
+    for case in results:
+        before = previous.get(case['name'])
+        if before is None:
+            continue
+        if before['success'] and not case['success']:
+            regressions.append({'name': case['name'], 'metric': 'success', 'baseline': True, 'current': False})
+        for metric in ('total', 'search'):
+            old, new = before['median'][metric], case['median'][metric]
+            # Ignore noise on cases that take a few milliseconds
+            if new > old * (1 + threshold) and new - old > 0.05:
+                regressions.append({
+                    'name': case['name'],
+                    'metric': metric,
+                    'baseline': old,
+                    'current': new,
+                    'change': round(new / old - 1, 3) if old else None,
+                })
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--cases', nargs='+', choices=sorted(CASES), default=list(CASES))
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--timeout', type=float, default=30)
+    parser.add_argument('--output', help='write results as JSON here (default: stdout)')
+    parser.add_argument('--baseline', help='results JSON of an earlier run to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2, help='allowed slowdown, as a fraction')
+    args = parser.parse_args()
+
+    from ortools import __version__ as ortools_version
+
+    report = {
+        'meta': {
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'python': platform.python_version(),
+            'ortools': ortools_version,
+            'machine': platform.machine(),
+            'cores': available_cores(),
+            'seed': args.seed,
+            'repeat': args.repeat,
+            'timeout_seconds': args.timeout,
+        },
+        'cases': run_benchmark(args.cases, args.seed, args.repeat, args.timeout),
+    }
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            report['regressions'] = compare(report['cases'], json.load(f), args.threshold)
+        for regression in report['regressions']:
+            print(f"REGRESSION {regression['name']} {regression['metric']}: "
+                  f"{regression['baseline']} -> {regression['current']}", file=sys.stderr)
+
+    encoded = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(encoded + '\n')
+    else:
+        print(encoded)
+
+    return 1 if report.get('regressions') else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,153 @@
+"""Result cache for identical schedule requests."""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+
+# Payload keys that change how long a solve may take but not which rota it returns
+IGNORED_KEYS = {'timeout_seconds'}
+
+
+def canonical_key(data):
+    payload = {key: value for key, value in data.items() if key not in IGNORED_KEYS}
+    payload['weeks'] = data.get('weeks', 1)
+    payload['staff'] = sorted(data.get('staff', []), key=lambda s: (str(s.get('id')), s.get('name', '')))
+    payload['shifts'] = sorted(data.get('shifts', []), key=_shift_sort_key)
+    payload['rules'] = sorted(data.get('rules', []), key=lambda r: (str(r.get('type')), str(r.get('name'))))
+
+    encoded = json.dumps(payload, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+
+def _shift_sort_key(shift):
+    return (
+        str(shift.get('day')),
+        str(shift.get('start_time')),
+        str(shift.get('end_time')),
+        str(shift.get('name')),
+        str(shift.get('id')),
+        shift.get('staff_required', 1),
+    )
+
+
+def _searches_finished(result):
+    # Plain rota searches report OPTIMAL too; FEASIBLE means an optimisation hit its limit
+    searches = (result.get('stats') or {}).get('searches', [])
+    return all(search.get('status') == 'OPTIMAL' for search in searches)
+
+
+class ResultCache:
+    """LRU + TTL cache of successful solve responses, optionally backed by SQLite."""
+
+    def __init__(self, max_entries=256, ttl_seconds=3600, db_path=None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.db_path = db_path
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.metrics = {'hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0}
+
+        if db_path:
+            with self._connect() as conn:
+                conn.execute(
+                    'CREATE TABLE IF NOT EXISTS results '
+                    '(key TEXT PRIMARY KEY, created_at REAL NOT NULL, result TEXT NOT NULL)'
+                )
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                created_at, result = entry
+                if now - created_at <= self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    self.metrics['hits'] += 1
+                    return result
+                del self._entries[key]
+
+        result = self._load(key, now)
+
+        with self._lock:
+            if result is None:
+                self.metrics['misses'] += 1
+                return None
+            self.metrics['hits'] += 1
+            self._remember(key, now, result)
+        return result
+
+    def put(self, key, result):
+        if not result.get('success'):
+            # Failures may be timeouts, which a retry with more time could fix
+            return
+        if result.get('fallback') or not _searches_finished(result):
+            # The time limit cut a search short, so more time could give a better rota
+            return
+        now = time.time()
+        with self._lock:
+            self.metrics['stores'] += 1
+            self._remember(key, now, result)
+        self._store(key, now, result)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.metrics['hits'] + self.metrics['misses']
+            return {
+                **self.metrics,
+                'entries': len(self._entries),
+                'hit_rate': round(self.metrics['hits'] / lookups, 3) if lookups else 0.0,
+                'persistent': bool(self.db_path),
+            }
+
+    def _remember(self, key, created_at, result):
+        self._entries[key] = (created_at, result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.metrics['evictions'] += 1
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=5)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _load(self, key, now):
+        if not self.db_path:
+            return None
+        with self._connect() as conn:
+            row = conn.execute('SELECT created_at, result FROM results WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return None
+            if now - row[0] > self.ttl_seconds:
+                conn.execute('DELETE FROM results WHERE key = ?', (key,))
+                return None
+        return json.loads(row[1])
+
+    def _store(self, key, created_at, result):
+        if not self.db_path:
+            return
+        with self._connect() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO results (key, created_at, result) VALUES (?, ?, ?)',
+                (key, created_at, json.dumps(result)),
+            )
+            conn.execute('DELETE FROM results WHERE created_at < ?', (created_at - self.ttl_seconds,))
+
+
+def create_result_cache():
+    return ResultCache(
+        max_entries=int(os.environ.get('SCHEDULER_CACHE_SIZE', 256)),
+        ttl_seconds=float(os.environ.get('SCHEDULER_CACHE_TTL', 3600)),
+        db_path=os.environ.get('SCHEDULER_CACHE_DB') or None,
+    )
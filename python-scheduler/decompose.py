@@ -0,0 +1,81 @@
+"""Solve independent groups of a site's staff as separate models."""
+
+import multiprocessing
+import time
+
+from batch import plan_pool
+from scheduler import ShiftlyScheduler
+from tuning import available_cores
+
+
+# Allowed for a spawned worker to start and import OR-tools
+PROCESS_STARTUP_SECONDS = 1.0
+
+
+def component_scheduler(data, search_workers, weekend_fair_share):
+    scheduler = ShiftlyScheduler(data)
+    scheduler.search_workers = search_workers
+    # The fairness rule's target is per staff member of the whole site
+    scheduler.weekend_fair_share = weekend_fair_share
+    return scheduler
+
+
+def solve_component(data, timeout_seconds, search_workers, weekend_fair_share, on_start=None):
+    """Pool entry point; runs in a worker process (or inline, with on_start given the scheduler)."""
+    try:
+        scheduler = component_scheduler(data, search_workers, weekend_fair_share)
+        if on_start is not None:
+            on_start(scheduler)
+        return scheduler.solve(timeout_seconds=timeout_seconds)
+    except Exception as e:
+        return {'success': False, 'error': str(e)}
+
+
+def solve_components(payloads, timeout_seconds, search_workers, weekend_fair_share, large=False,
+                     is_cancelled=None, on_start=None):
+    """Responses for every component payload, in the order given."""
+    started = time.monotonic()
+    cores = max(1, min(available_cores(), search_workers))
+    processes, workers = plan_pool(len(payloads), cores=cores)
+    
+    if not large or processes < 2 or multiprocessing.current_process().daemon:
+        responses = []
+        for index, data in enumerate(payloads):
+            if is_cancelled is not None and is_cancelled():
+                break
+            # Time a group doesn't use rolls forward to the ones after it
+            remaining = max(0.1, timeout_seconds - (time.monotonic() - started))
+            responses.append(solve_component(
+                data, remaining / (len(payloads) - index), cores, weekend_fair_share, on_start=on_start
+            ))
+        return responses
+    
+    # Workers need time to start and import OR-tools before their own deadline begins
+    component_timeout = max(timeout_seconds / 2, timeout_seconds - PROCESS_STARTUP_SECONDS)
+    responses = [None] * len(payloads)
+    # spawn, not fork, as in batch.py; leaving the block terminates any worker still solving
+    with multiprocessing.get_context('spawn').Pool(processes) as pool:
+        pending = {
+            index: pool.apply_async(solve_component, (data, component_timeout, workers, weekend_fair_share))
+            for index, data in enumerate(payloads)
+        }
+        while pending:
+            if is_cancelled is not None and is_cancelled():
+                break
+            if time.monotonic() - started >= timeout_seconds:
+                for index in pending:
+                    responses[index] = {
+                        'success': False,
+                        'error': 'The time limit ran out before this group of staff was scheduled.',
+                    }
+                break
+            for index, result in list(pending.items()):
+                if result.ready():
+                    del pending[index]
+                    try:
+                        responses[index] = result.get()
+                    except Exception as e:
+                        responses[index] = {'success': False, 'error': str(e)}
+            if pending:
+                next(iter(pending.values())).wait(0.2)
+    return responses
@@ -0,0 +1,147 @@
+"""Background solve jobs for the /jobs API."""
+
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from cache import canonical_key
+from metrics import solve_metrics
+from scheduler import ShiftlyScheduler
+
+
+class QueueFullError(Exception):
+    pass
+
+
+# Jobs live in this process's memory, so run the API as one worker process with several threads
+class JobQueue:
+
+    def __init__(self, max_workers=2, max_pending=20, retention_seconds=900, result_cache=None):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.retention_seconds = retention_seconds
+        self.result_cache = result_cache
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='solve')
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, data, timeout_seconds):
+        # Parsing, cache lookups and preflight stay outside the lock so polls aren't held up
+        scheduler = ShiftlyScheduler(data)
+        cache_key = None
+        cached = None
+        if self.result_cache is not None:
+            cache_key = canonical_key(data)
+            cached = self.result_cache.get(cache_key)
+        # Hopeless input fails here rather than taking a solver thread
+        rejection = scheduler.preflight() if cached is None else None
+
+        with self._lock:
+            self._prune()
+            pending = sum(1 for job in self._jobs.values() if job['status'] in ('queued', 'running'))
+            if pending >= self.max_pending:
+                raise QueueFullError(f'{pending} rotas are already being generated, try again shortly')
+
+            job_id = uuid.uuid4().hex
+            job = {
+                'id': job_id,
+                'status': 'queued',
+                'created_at': time.time(),
+                'started_at': None,
+                'finished_at': None,
+                'result': None,
+                'scheduler': scheduler,
+                'cache_key': cache_key,
+                'future': None,
+            }
+            self._jobs[job_id] = job
+
+            if cached is not None:
+                self._finish(job, 'succeeded', cached)
+            elif rejection is not None:
+                self._finish(job, 'failed', rejection)
+            else:
+                job['future'] = self._executor.submit(self._run, job, timeout_seconds)
+        return job_id
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            return self._snapshot(job)
+
+    def cancel(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            if job['status'] == 'queued' and job['future'].cancel():
+                self._finish(job, 'cancelled', None)
+            elif job['status'] in ('queued', 'running'):
+                # Solver threads can't be killed; StopSearch ends the search and _run records it
+                job['scheduler'].cancel()
+            return self._snapshot(job)
+
+    def _run(self, job, timeout_seconds):
+        with self._lock:
+            if job['status'] != 'queued':
+                return
+            job['status'] = 'running'
+            job['started_at'] = time.time()
+
+        try:
+            result = job['scheduler'].solve(timeout_seconds=timeout_seconds)
+        except Exception as e:
+            result = {'success': False, 'error': str(e)}
+        solve_metrics.observe(result, 'jobs')
+
+        if job['cache_key'] is not None:
+            self.result_cache.put(job['cache_key'], result)
+
+        with self._lock:
+            if result.get('cancelled'):
+                status = 'cancelled'
+            elif result.get('success'):
+                status = 'succeeded'
+            else:
+                status = 'failed'
+            self._finish(job, status, result)
+
+    def _finish(self, job, status, result):
+        job['status'] = status
+        job['result'] = result
+        job['finished_at'] = time.time()
+        job['scheduler'] = None
+
+    def _prune(self):
+        cutoff = time.time() - self.retention_seconds
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job['finished_at'] is not None and job['finished_at'] < cutoff
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def _snapshot(self, job):
+        snapshot = {
+            'job_id': job['id'],
+            'status': job['status'],
+            'created_at': job['created_at'],
+            'started_at': job['started_at'],
+            'finished_at': job['finished_at'],
+        }
+        if job['result'] is not None:
+            snapshot['result'] = job['result']
+        return snapshot
+
+
+def create_job_queue(result_cache=None):
+    return JobQueue(
+        max_workers=int(os.environ.get('SCHEDULER_MAX_JOBS', 2)),
+        max_pending=int(os.environ.get('SCHEDULER_MAX_PENDING_JOBS', 20)),
+        result_cache=result_cache,
+    )
@@ -0,0 +1,128 @@
+"""Prometheus-style metrics for solves handled by this process."""
+
+import threading
+from collections import defaultdict
+
+from scheduler import peak_rss_mb
+
+
+# Upper bounds, in seconds, of the solve duration histogram buckets
+DURATION_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+class SolveMetrics:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._solves = defaultdict(int)
+        self._duration_buckets = [0] * len(DURATION_BUCKETS)
+        self._duration_count = 0
+        self._duration_sum = 0.0
+        self._phase_seconds = defaultdict(float)
+        self._searches = defaultdict(int)
+        self._search_seconds = 0.0
+        self._branches = 0
+        self._conflicts = 0
+        self._model_variables = defaultdict(int)
+        self._model_constraints = defaultdict(int)
+        self._cache_hits = defaultdict(int)
+
+    def observe(self, result, endpoint):
+        """Record one solve response (success or failure) served by endpoint."""
+        stats = result.get('stats') or {}
+        if result.get('cancelled'):
+            outcome = 'cancelled'
+        elif result.get('success'):
+            outcome = 'success'
+        else:
+            outcome = 'failure'
+
+        with self._lock:
+            self._solves[endpoint, outcome] += 1
+
+            elapsed = stats.get('elapsed')
+            if elapsed is not None:
+                self._duration_count += 1
+                self._duration_sum += elapsed
+                for i, bound in enumerate(DURATION_BUCKETS):
+                    if elapsed <= bound:
+                        self._duration_buckets[i] += 1
+
+            for phase, seconds in (stats.get('phases') or {}).items():
+                self._phase_seconds[phase] += seconds
+
+            for search in stats.get('searches') or []:
+                self._searches[search['status']] += 1
+                self._search_seconds += search['wall_time']
+                self._branches += search['branches']
+                self._conflicts += search['conflicts']
+                for family, size in search['model']['families'].items():
+                    self._model_variables[family] += size['variables']
+                    self._model_constraints[family] += size['constraints']
+
+    def observe_cache_hit(self, endpoint):
+        with self._lock:
+            self._cache_hits[endpoint] += 1
+
+    def render(self, cache_stats=None):
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            for labels, value in samples:
+                label_text = ','.join(f'{key}="{val}"' for key, val in labels)
+                lines.append(f'{name}{{{label_text}}} {value}' if label_text else f'{name} {value}')
+
+        with self._lock:
+            metric('scheduler_solves_total', 'counter', 'Solves served, by endpoint and outcome.', [
+                ((('endpoint', endpoint), ('outcome', outcome)), count)
+                for (endpoint, outcome), count in sorted(self._solves.items())
+            ])
+            metric('scheduler_solve_cache_hits_total', 'counter', 'Solves answered from the result cache.', [
+                ((('endpoint', endpoint),), count) for endpoint, count in sorted(self._cache_hits.items())
+            ])
+
+            # Bucket counts are already cumulative (see observe())
+            metric('scheduler_solve_duration_seconds', 'histogram', 'Wall-clock time of whole solves.', [])
+            for bound, count in zip(DURATION_BUCKETS, self._duration_buckets):
+                lines.append(f'scheduler_solve_duration_seconds_bucket{{le="{bound}"}} {count}')
+            lines.append(f'scheduler_solve_duration_seconds_bucket{{le="+Inf"}} {self._duration_count}')
+            lines.append(f'scheduler_solve_duration_seconds_sum {round(self._duration_sum, 6)}')
+            lines.append(f'scheduler_solve_duration_seconds_count {self._duration_count}')
+
+            metric('scheduler_phase_seconds_total', 'counter', 'Time spent in each solve phase.', [
+                ((('phase', phase),), round(seconds, 6)) for phase, seconds in sorted(self._phase_seconds.items())
+            ])
+            metric('scheduler_searches_total', 'counter', 'CP-SAT searches, by final status.', [
+                ((('status', status),), count) for status, count in sorted(self._searches.items())
+            ])
+            metric('scheduler_search_seconds_total', 'counter', 'CP-SAT search wall time.', [
+                ((), round(self._search_seconds, 6))
+            ])
+            metric('scheduler_search_branches_total', 'counter', 'CP-SAT search branches.', [((), self._branches)])
+            metric('scheduler_search_conflicts_total', 'counter', 'CP-SAT search conflicts.', [((), self._conflicts)])
+            metric('scheduler_model_variables_total', 'counter', 'Model variables built, by constraint family.', [
+                ((('family', family),), count) for family, count in sorted(self._model_variables.items())
+            ])
+            metric('scheduler_model_constraints_total', 'counter', 'Model constraints built, by constraint family.', [
+                ((('family', family),), count) for family, count in sorted(self._model_constraints.items())
+            ])
+
+        if cache_stats is not None:
+            metric('scheduler_result_cache_entries', 'gauge', 'Entries in the in-memory result cache.', [
+                ((), cache_stats['entries'])
+            ])
+            metric('scheduler_result_cache_lookups_total', 'counter', 'Result cache lookups, by result.', [
+                ((('result', 'hit'),), cache_stats['hits']),
+                ((('result', 'miss'),), cache_stats['misses']),
+            ])
+
+        metric('scheduler_peak_rss_bytes', 'gauge', 'Peak resident memory of this process.', [
+            ((), int(peak_rss_mb() * 1024 * 1024))
+        ])
+        return '\n'.join(lines) + '\n'
+
+
+# Counts live in process memory, so (as with jobs.py) run the API as a single worker process
+solve_metrics = SolveMetrics()
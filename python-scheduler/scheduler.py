@@ -1,162 +1,1453 @@
 #!/usr/bin/env python3
 
 from ortools.sat.python import cp_model
+from contextlib import contextmanager
+from functools import lru_cache
+import numpy as np
 import json
+import math
+import resource
+import queue
 import sys
+import threading
+import time
+
+from tuning import default_tuner
+
+
+DAY_ORDER = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+WEEKEND_DAYS = ['Saturday', 'Sunday']
+
+# Shift classes used by the clopening rule
+CLOSING_END_MINUTES = 22 * 60
+OPENING_START_MINUTES = 8 * 60
+
+# Most CP-SAT workers a solve may use; batch.py lowers this when solves share
+# the machine, and the tuner picks fewer for small models
+DEFAULT_SEARCH_WORKERS = 8
+
+# Eligible pairs from which independent groups of staff are solved in separate
+# processes; below this, starting a process costs more than the search
+PARALLEL_COMPONENT_PAIRS = 2000
+
+# Soft-constraint mode: penalty per unit a limit is broken by. Units are staff
+# for coverage, started hours for the hours limits, and days, shifts or
+# changed assignments for the rules. Override with 'penalty_weights'.
+DEFAULT_PENALTY_WEIGHTS = {
+    'coverage': 1000,
+    'max_hours': 200,
+    'contract_hours': 50,
+    'rest_between_shifts': 100,
+    'no_clopening': 100,
+    'max_consecutive_days': 100,
+    'minimum_days_off': 100,
+    'fair_weekend_distribution': 20,
+    'variety': 5,
+}
+
+
+@lru_cache(maxsize=4096)
+def parse_time(time_str):
+    hours, minutes = map(int, time_str.split(':'))
+    return hours * 60 + minutes
+
+
+class ShiftCatalogue:
+    """Per-shift facts computed once: minute times, durations, closing/opening flags and a day index."""
+    
+    def __init__(self, shifts):
+        self.start = []
+        # Minutes from the start of the shift's day, so overnight shifts end after 1440
+        self.end = []
+        self.duration = []
+        # Place in DAY_ORDER; None for a day name the rules don't know (as in the validator)
+        self.day_position = []
+        self.closing = []
+        self.opening = []
+        self.by_day = {}
+        
+        for shift_idx, shift in enumerate(shifts):
+            start = parse_time(shift['start_time'])
+            end = parse_time(shift['end_time'])
+            if end <= start:
+                end += 1440
+            closing = end >= CLOSING_END_MINUTES
+            opening = start <= OPENING_START_MINUTES
+            
+            self.start.append(start)
+            self.end.append(end)
+            self.duration.append(end - start)
+            self.closing.append(closing)
+            self.opening.append(opening)
+            
+            day = shift['day']
+            self.day_position.append(DAY_ORDER.index(day) if day in DAY_ORDER else None)
+            self.by_day.setdefault(day, []).append(shift_idx)
+        
+        # Distinct shift lengths in minutes, shortest first
+        self.durations = sorted(set(self.duration))
+        self._rest_conflicts = {}
+        self._reachability = {}
+    
+    def weekend_shift_count(self):
+        return sum(len(self.by_day.get(day, [])) for day in WEEKEND_DAYS)
+    
+    def rest_conflicts(self, min_rest_minutes):
+        """{shift_idx: set of next-day shifts starting less than min_rest after it ends}."""
+        conflicts = self._rest_conflicts.get(min_rest_minutes)
+        if conflicts is not None:
+            return conflicts
+        
+        conflicts = {}
+        for day_idx, day in enumerate(DAY_ORDER):
+            next_day = DAY_ORDER[(day_idx + 1) % len(DAY_ORDER)]
+            next_shifts = self.by_day.get(next_day, [])
+            for shift_idx in self.by_day.get(day, []):
+                too_soon = {
+                    next_idx for next_idx in next_shifts
+                    if self.start[next_idx] + 1440 - self.end[shift_idx] < min_rest_minutes
+                }
+                if too_soon:
+                    conflicts[shift_idx] = too_soon
+        self._rest_conflicts[min_rest_minutes] = conflicts
+        return conflicts
+    
+    def reachability(self, durations=None):
+        """HoursReachability for a set of shift lengths (default: every length), built once."""
+        key = tuple(sorted(set(self.durations if durations is None else durations)))
+        reachability = self._reachability.get(key)
+        if reachability is None:
+            reachability = HoursReachability(key, max_shifts=len(DAY_ORDER))
+            self._reachability[key] = reachability
+        return reachability
+
+
+class HoursReachability:
+    """Which weekly totals, in whole minutes, up to max_shifts shifts can add up to."""
+    
+    def __init__(self, durations, max_shifts=7):
+        self.durations = sorted(set(durations))
+        self.max_shifts = max_shifts
+        self.limit = max_shifts * (self.durations[-1] if self.durations else 0)
+        
+        # reachable[k]: totals buildable from at most k shifts
+        reachable = np.zeros((max_shifts + 1, self.limit + 1), dtype=bool)
+        reachable[0, 0] = True
+        for k in range(1, max_shifts + 1):
+            reachable[k] = reachable[k - 1]
+            for duration in self.durations:
+                reachable[k, duration:] |= reachable[k - 1, :self.limit + 1 - duration]
+        
+        # _counts[k, t]: reachable totals below t, so any window is two lookups
+        self._counts = np.zeros((max_shifts + 1, self.limit + 2), dtype=np.int64)
+        np.cumsum(reachable, axis=1, out=self._counts[:, 1:])
+        
+        # Nearest reachable total at or below / at or above each total
+        totals = np.arange(self.limit + 1)
+        self._below = np.maximum.accumulate(np.where(reachable, totals, -1), axis=1)
+        self._above = np.minimum.accumulate(
+            np.where(reachable, totals, self.limit + 1)[:, ::-1], axis=1
+        )[:, ::-1]
+    
+    def can_build(self, low, high, max_shifts=None):
+        """Whether some total within [low, high] minutes is reachable."""
+        k = self._shift_limit(max_shifts)
+        low = max(0, math.ceil(low))
+        high = min(self.limit, math.floor(high))
+        if low > high:
+            return False
+        return bool(self._counts[k, high + 1] > self._counts[k, low])
+    
+    def closest(self, target, max_shifts=None):
+        """The reachable total nearest to target minutes (the lower one on a tie)."""
+        k = self._shift_limit(max_shifts)
+        total = min(max(0, int(round(target))), self.limit)
+        candidates = [int(self._below[k, total]), int(self._above[k, total])]
+        candidates = [c for c in candidates if 0 <= c <= self.limit]
+        return min(candidates, key=lambda c: (abs(c - target), c))
+    
+    def _shift_limit(self, max_shifts):
+        if max_shifts is None:
+            return self.max_shifts
+        return max(0, min(max_shifts, self.max_shifts))
+
+
+class SolveDeadline:
+    """Single wall-clock budget shared by every week and phase of a solve."""
+    
+    def __init__(self, timeout_seconds):
+        self.timeout_seconds = timeout_seconds
+        self.started = time.monotonic()
+        self.phases = {}
+        # Held back from search so a failed week can still be diagnosed
+        self.diagnostics_reserve = min(2.0, timeout_seconds * 0.1)
+    
+    def elapsed(self):
+        return time.monotonic() - self.started
+    
+    def remaining(self):
+        return max(0.0, self.timeout_seconds - self.elapsed())
+    
+    def search_allowance(self, weeks_left=1):
+        available = self.remaining() - self.diagnostics_reserve
+        return max(0.1, available / max(1, weeks_left))
+    
+    @contextmanager
+    def phase(self, name):
+        phase_start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.monotonic() - phase_start
+    
+    def report(self):
+        return {
+            'time_budget': self.timeout_seconds,
+            'elapsed': round(self.elapsed(), 3),
+            'phases': {name: round(seconds, 3) for name, seconds in self.phases.items()},
+        }
+
+
+class SolutionStreamCallback(cp_model.CpSolverSolutionCallback):
+    """Hands every improving solution of a search to ShiftlyScheduler.on_solution."""
+    
+    def __init__(self, scheduler, week_schedules, first_week):
+        super().__init__()
+        self._scheduler = scheduler
+        self._week_schedules = week_schedules
+        self._first_week = first_week
+    
+    def on_solution_callback(self):
+        results = [
+            {'solution': self._scheduler._extract_solution(self, schedule)}
+            for schedule in self._week_schedules
+        ]
+        self._scheduler.on_solution({
+            'event': 'solution',
+            'weeks': [self._first_week + i for i in range(len(results))],
+            'objective': self.ObjectiveValue(),
+            'bound': self.BestObjectiveBound(),
+            'wall_time': self.WallTime(),
+            'schedule': self._scheduler._format_schedule(results, first_week=self._first_week),
+        })
+
+
+class ConstraintLedger:
+    """Posts a model's limits as hard constraints, penalised slack, or guarded groups."""
+    
+    # Upper bound for any one slack variable, in its own units; presolve tightens it
+    MAX_SLACK = 10000
+    
+    # Explain mode guards these per shift, person or earlier week; rules are guarded whole
+    PER_SUBJECT_GROUPS = {'coverage', 'contract_hours', 'max_hours', 'variety'}
+    
+    def __init__(self, model, soft=False, weights=None, explain=False):
+        self.model = model
+        self.soft = soft
+        self.explain = explain
+        self.weights = {**DEFAULT_PENALTY_WEIGHTS, **(weights or {})}
+        # Week recorded with each slack or guard; a range like '1-2' for cross-week limits
+        self.week = None
+        self.slacks = []
+        self.guards = {}
+        # {family: {'variables', 'constraints'}} posted so far (see family())
+        self.sizes = {}
+    
+    def require(self, group, subject, expr, lower=None, upper=None, unit=1):
+        """Post lower <= expr <= upper. Soft slack counts whole multiples of unit."""
+        if not self.soft:
+            constraints = []
+            if lower is not None:
+                constraints.append(self.model.Add(expr >= lower))
+            if upper is not None:
+                constraints.append(self.model.Add(expr <= upper))
+            if self.explain:
+                guard = self._guard(group, subject)
+                for constraint in constraints:
+                    constraint.OnlyEnforceIf(guard)
+            return
+        
+        if lower is not None:
+            slack = self.model.NewIntVar(0, self.MAX_SLACK, '')
+            self.model.Add(expr + unit * slack >= lower)
+            self._record(group, subject, 'under', slack)
+        if upper is not None:
+            slack = self.model.NewIntVar(0, self.MAX_SLACK, '')
+            self.model.Add(expr - unit * slack <= upper)
+            self._record(group, subject, 'over', slack)
+    
+    @contextmanager
+    def family(self, name):
+        """Count the variables and constraints added inside the block against name."""
+        proto = self.model.Proto()
+        variables, constraints = len(proto.variables), len(proto.constraints)
+        try:
+            yield
+        finally:
+            proto = self.model.Proto()
+            size = self.sizes.setdefault(name, {'variables': 0, 'constraints': 0})
+            size['variables'] += len(proto.variables) - variables
+            size['constraints'] += len(proto.constraints) - constraints
+    
+    def model_size(self):
+        proto = self.model.Proto()
+        return {
+            'variables': len(proto.variables),
+            'constraints': len(proto.constraints),
+            'families': self.sizes,
+        }
+    
+    def _guard(self, group, subject):
+        key = (self.week, group, subject if group in self.PER_SUBJECT_GROUPS else None)
+        guard = self.guards.get(key)
+        if guard is None:
+            guard = self.model.NewBoolVar(f'assume_{len(self.guards)}')
+            self.guards[key] = guard
+        return guard
+    
+    def describe(self, guards):
+        """{'week', 'constraint', 'subject'} for each of the given guard literals."""
+        indexes = {guard.Index() for guard in guards}
+        return [
+            {'week': week, 'constraint': group, 'subject': subject}
+            for (week, group, subject), guard in self.guards.items()
+            if guard.Index() in indexes
+        ]
+    
+    def _record(self, group, subject, direction, slack):
+        self.slacks.append({
+            'week': self.week,
+            'constraint': group,
+            'subject': subject,
+            'direction': direction,
+            'slack': slack,
+        })
+    
+    def penalty(self):
+        return sum(self.weights.get(entry['constraint'], 1) * entry['slack'] for entry in self.slacks)
+    
+    def violations(self, solver):
+        violations = []
+        for entry in self.slacks:
+            amount = solver.Value(entry['slack'])
+            if amount:
+                violations.append({
+                    'week': entry['week'],
+                    'constraint': entry['constraint'],
+                    'subject': entry['subject'],
+                    'direction': entry['direction'],
+                    'amount': amount,
+                    'penalty': amount * self.weights.get(entry['constraint'], 1),
+                })
+        return violations
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process so far (not just the current solve)."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # KiB on Linux, bytes on macOS
+    return round(peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024, 1)
+
+
+def rule_enabled(rules, rule_name):
+    for rule in rules:
+        if rule.get('type') == rule_name or rule.get('name') == rule_name:
+            return rule.get('enabled', True)
+    return False
+
+
+def get_rule_value(rules, rule_name, default):
+    for rule in rules:
+        if rule.get('type') == rule_name or rule.get('name') == rule_name:
+            return rule.get('value', default)
+    return default
+
+
+class ComplianceValidator:
+    """Checks a formatted schedule against the enabled rules without a CP model."""
+    
+    def __init__(self, staff, rules):
+        self.staff_names = [s['name'] for s in staff]
+        self.roster_position = {}
+        for position, name in enumerate(self.staff_names):
+            self.roster_position.setdefault(name, position)
+        self.rules = rules
+    
+    def validate(self, schedule):
+        rest_enabled = rule_enabled(self.rules, 'rest_between_shifts')
+        min_rest = get_rule_value(self.rules, 'rest_between_shifts', 12)
+        clopening_enabled = rule_enabled(self.rules, 'no_clopening')
+        weekends_enabled = rule_enabled(self.rules, 'fair_weekend_distribution')
+        consecutive_enabled = rule_enabled(self.rules, 'max_consecutive_days')
+        max_days = get_rule_value(self.rules, 'max_consecutive_days', 6)
+        days_off_enabled = rule_enabled(self.rules, 'minimum_days_off')
+        min_days_off = get_rule_value(self.rules, 'minimum_days_off', 2)
+        
+        double_shifts = []
+        rest = []
+        clopening = []
+        consecutive = []
+        days_off = []
+        weekend_patterns = {
+            name: {'full_weekends_worked': 0, 'partial_weekends': 0, 'full_weekends_off': 0, 'total_shifts': 0}
+            for name in self.staff_names
+        }
+        
+        for week_label, grid in self._index(schedule):
+            # Staff in first-appearance order, then rostered staff with no shifts this week
+            staff_names = list(grid)
+            staff_names += [name for name in self.staff_names if name not in grid]
+            # (sort key, violation) pairs, put in report order at the end of the week
+            week_double_shifts = []
+            week_clopening = []
+            week_days_off = []
+            
+            for staff_name in staff_names:
+                days = grid.get(staff_name) or [[] for _ in DAY_ORDER]
+                worked_days = 0
+                run = []
+                
+                for day_idx, cell in enumerate(days):
+                    day = DAY_ORDER[day_idx]
+                    if not cell:
+                        if consecutive_enabled and len(run) > max_days:
+                            consecutive.append(self._consecutive_violation(staff_name, week_label, run))
+                        run = []
+                        continue
+                    
+                    worked_days += 1
+                    run.append(day)
+                    
+                    if len(cell) > 1:
+                        week_double_shifts.append((cell[0][3], {
+                            'staff': staff_name,
+                            'day': day,
+                            'week': week_label,
+                            'issue': f"Assigned to {len(cell)} shifts: {', '.join(s[2] for s in cell)}",
+                            'solution': f"Remove one shift or assign to different staff"
+                        }))
+                    
+                    previous = days[day_idx - 1] if day_idx > 0 else None
+                    if not previous:
+                        continue
+                    previous_day = DAY_ORDER[day_idx - 1]
+                    
+                    if rest_enabled:
+                        last_shift = max(previous, key=lambda s: s[1])
+                        first_shift = min(cell, key=lambda s: s[0])
+                        rest_hours = (first_shift[0] + 1440 - last_shift[1]) / 60
+                        if rest_hours < min_rest:
+                            rest.append({
+                                'staff': staff_name,
+                                'day': f"{previous_day}-{day}",
+                                'week': week_label,
+                                'issue': f"Only {rest_hours:.1f}h rest between {last_shift[2]} and {first_shift[2]}",
+                                'solution': f"Swap {day}'s {first_shift[2]} with another staff member"
+                            })
+                    
+                    if clopening_enabled:
+                        for closing in previous:
+                            if closing[1] < CLOSING_END_MINUTES:
+                                continue
+                            for opening in cell:
+                                if opening[0] <= OPENING_START_MINUTES:
+                                    week_clopening.append(((day_idx, closing[3], opening[3]), {
+                                        'staff': staff_name,
+                                        'day': f"{previous_day}-{day}",
+                                        'week': week_label,
+                                        'issue': f"Closing shift ({closing[2]}) followed by opening shift ({opening[2]})",
+                                        'solution': f"Swap {day}'s {opening[2]} with another staff member"
+                                    }))
+                
+                if consecutive_enabled and len(run) > max_days:
+                    consecutive.append(self._consecutive_violation(staff_name, week_label, run))
+                
+                if days_off_enabled and staff_name in self.roster_position:
+                    off = len(DAY_ORDER) - worked_days
+                    if off < min_days_off:
+                        week_days_off.append((self.roster_position[staff_name], {
+                            'staff': staff_name,
+                            'day': 'Full week',
+                            'week': week_label,
+                            'issue': f"Only {off} day(s) off this week",
+                            'solution': f"Remove {min_days_off - off} shift(s) or reduce contracted hours"
+                        }))
+                
+                if weekends_enabled:
+                    weekend = [len(days[DAY_ORDER.index(day)]) for day in WEEKEND_DAYS]
+                    pattern = weekend_patterns.setdefault(staff_name, {
+                        'full_weekends_worked': 0, 'partial_weekends': 0, 'full_weekends_off': 0, 'total_shifts': 0
+                    })
+                    pattern['total_shifts'] += sum(weekend)
+                    days_worked = sum(1 for count in weekend if count)
+                    if days_worked == 2:
+                        pattern['full_weekends_worked'] += 1
+                    elif days_worked == 1:
+                        pattern['partial_weekends'] += 1
+                    else:
+                        pattern['full_weekends_off'] += 1
+            
+            double_shifts += [violation for _, violation in sorted(week_double_shifts, key=lambda item: item[0])]
+            clopening += [violation for _, violation in sorted(week_clopening, key=lambda item: item[0])]
+            days_off += [violation for _, violation in sorted(week_days_off, key=lambda item: item[0])]
+        
+        compliance = [self._report(
+            'No Double Shifts', double_shifts,
+            'No staff member works more than one shift per day.',
+            f'Found {len(double_shifts)} double shift assignment(s).'
+        )]
+        
+        if rest_enabled:
+            compliance.append(self._report(
+                f'Overnight Rest ({min_rest}+ hours)', rest,
+                f'All staff have at least {min_rest} hours rest between shifts on consecutive days.',
+                f'Found {len(rest)} case(s) of insufficient overnight rest.'
+            ))
+        
+        if clopening_enabled:
+            compliance.append(self._report(
+                'No Clopening', clopening,
+                'No staff member works a closing shift followed by an opening shift the next day.',
+                f'Found {len(clopening)} clopening occurrence(s).'
+            ))
+        
+        if weekends_enabled:
+            compliance.append(self._weekend_report(weekend_patterns))
+        
+        if consecutive_enabled:
+            compliance.append(self._report(
+                f'Maximum {max_days} Consecutive Days', consecutive,
+                f'No staff member works more than {max_days} consecutive days.',
+                f'Found {len(consecutive)} case(s) of too many consecutive working days.'
+            ))
+        
+        if days_off_enabled:
+            compliance.append(self._report(
+                f'Minimum {min_days_off} Days Off', days_off,
+                f'All staff have at least {min_days_off} days off per week.',
+                f'Found {len(days_off)} case(s) of insufficient days off.'
+            ))
+        
+        return compliance
+    
+    def _index(self, schedule):
+        """Yield (week label, {staff_name: [7 day cells of (start, end, shift_name, position)]}) per week."""
+        day_index = {day: i for i, day in enumerate(DAY_ORDER)}
+        for week_data in schedule:
+            grid = {}
+            for position, shift in enumerate(week_data['shifts']):
+                day_idx = day_index.get(shift['day'])
+                if day_idx is None:
+                    continue
+                start = parse_time(shift['start_time'])
+                end = parse_time(shift['end_time'])
+                if end <= start:
+                    end += 1440
+                days = grid.get(shift['staff_name'])
+                if days is None:
+                    days = grid[shift['staff_name']] = [[] for _ in DAY_ORDER]
+                days[day_idx].append((start, end, shift['shift_name'], position))
+            yield f"Week {week_data['week']}", grid
+    
+    def _consecutive_violation(self, staff_name, week_label, run):
+        return {
+            'staff': staff_name,
+            'day': f"{run[0]}-{run[-1]}",
+            'week': week_label,
+            'issue': f"Worked {len(run)} consecutive days",
+            'solution': f"Add a day off during this period or reduce shift assignments"
+        }
+    
+    def _report(self, rule, violations, followed_details, compromised_details):
+        if len(violations) == 0:
+            return {
+                'rule': rule,
+                'status': 'followed',
+                'details': followed_details,
+                'violations': []
+            }
+        return {
+            'rule': rule,
+            'status': 'compromised',
+            'details': compromised_details,
+            'violations': violations
+        }
+    
+    def _weekend_report(self, weekend_patterns):
+        full_weekends_worked = {name: data['full_weekends_worked'] for name, data in weekend_patterns.items()}
+        min_full_weekends = min(full_weekends_worked.values()) if full_weekends_worked else 0
+        max_full_weekends = max(full_weekends_worked.values()) if full_weekends_worked else 0
+        difference = max_full_weekends - min_full_weekends
+        
+        if difference <= 1:
+            return {
+                'rule': 'Fair Weekend Distribution',
+                'status': 'followed',
+                'details': f'Weekend patterns are fairly distributed. Max difference in full weekends worked: {difference}.',
+                'violations': []
+            }
+        
+        weekend_violations = []
+        for staff_name, patterns in sorted(weekend_patterns.items(), key=lambda x: x[1]['full_weekends_worked'], reverse=True):
+            full_worked = patterns['full_weekends_worked']
+            partial = patterns['partial_weekends']
+            full_off = patterns['full_weekends_off']
+            
+            if full_worked > min_full_weekends + 1:
+                weekend_violations.append({
+                    'staff': staff_name,
+                    'day': 'Weekends',
+                    'week': 'All weeks',
+                    'issue': f'{full_worked} full weekend{"s" if full_worked != 1 else ""} worked, {partial} partial, {full_off} completely off',
+                    'solution': f'Consider rotating full weekends more evenly - aim for {min_full_weekends}-{min_full_weekends + 1} full weekends per person'
+                })
+        
+        return {
+            'rule': 'Fair Weekend Distribution',
+            'status': 'compromised',
+            'details': f'Weekend distribution varies by {difference} full weekends. Some staff work more full weekends than others.',
+            'violations': weekend_violations
+        }
+
+
+def validate_schedule(schedule, rules, staff=None):
+    """Compliance report for an existing schedule, e.g. one edited in the UI."""
+    if staff is None:
+        names = []
+        for week_data in schedule:
+            for shift in week_data['shifts']:
+                if shift['staff_name'] not in names:
+                    names.append(shift['staff_name'])
+        staff = [{'name': name} for name in names]
+    return ComplianceValidator(staff, rules).validate(schedule)
 
 
 class ShiftlyScheduler:
     
     def __init__(self, data):
+        self.data = data
         self.staff = data['staff']
         self.shifts = data['shifts']
         self.rules = data['rules']
         self.weeks = data.get('weeks', 1)
+        # 'sequential' solves week by week; 'joint' builds one model for the whole horizon
+        self.multi_week_mode = data.get('multi_week_mode', 'sequential')
+        # A re-roll ("generate a different rota") passes a new seed to get a different solution
+        self.seed = data.get('seed')
+        
+        # Incremental re-solve: a previous rota (the 'schedule' of an earlier response)
+        # seeds the search with hints, and can optionally be kept as close as possible
+        self.previous_assignments = self._index_previous_schedule(data.get('previous_schedule') or [])
+        self.minimise_changes = bool(data.get('minimise_changes', False)) and bool(self.previous_assignments)
+        
+        # Input problems that don't stop the solve, reported with the response
+        self.warnings = []
+        
+        # Rolling horizon: the 'boundary_state' of the previous week's response carries
+        # consecutive days and last shifts into week 1, so rules don't reset at Monday
+        self.boundary = self._index_boundary_state(data.get('boundary_state') or {})
+        
+        # Soft mode turns every limit into weighted slack instead of failing the week
+        self.soft_constraints = bool(data.get('soft_constraints', False))
+        self.penalty_weights = data.get('penalty_weights') or {}
+        
+        # "Regenerate" pool: alternatives=K asks for up to K - 1 more rotas from the final
+        # search, each differing from every other in at least alternative_distance assignments
+        self.alternatives = max(1, int(data.get('alternatives', 1)))
+        self.alternative_distance = data.get('alternative_distance')
+        # Ledger of the model currently being built (see _new_model())
+        self.ledger = None
         
         self.contract_issues = []
         self.all_solutions = []
         
-    def solve_single_week(self, week_num, previous_solutions=None):
-        model = cp_model.CpModel()
+        self.catalogue = ShiftCatalogue(self.shifts)
+        
+        # Weekend shifts per staff member the fairness rule aims for; decompose.py gives
+        # each component the whole site's share
+        weekend_shifts = self.catalogue.weekend_shift_count()
+        self.weekend_fair_share = weekend_shifts // len(self.staff) if weekend_shifts and self.staff else None
+        
+        # eligible[shift_idx, staff_idx]: staff is available for the whole shift
+        self.eligible = self._compile_eligibility()
+        
+        # Decision variables exist only for eligible pairs; these index them by shift,
+        # by staff, and by staff and day
+        self.eligible_pairs = [(int(shift_idx), int(staff_idx)) for shift_idx, staff_idx in np.argwhere(self.eligible)]
+        self.staff_for_shift = [[] for _ in self.shifts]
+        self.shifts_for_staff = [[] for _ in self.staff]
+        self.staff_day_shifts = [{} for _ in self.staff]
+        for shift_idx, staff_idx in self.eligible_pairs:
+            self.staff_for_shift[shift_idx].append(staff_idx)
+            self.shifts_for_staff[staff_idx].append(shift_idx)
+            self.staff_day_shifts[staff_idx].setdefault(self.shifts[shift_idx]['day'], []).append(shift_idx)
+        
+        # Lets another thread stop a running solve (see cancel())
+        self.cancelled = False
+        self._active_solver = None
+        # Schedulers of independent groups being solved in this process (see _solve_components())
+        self._active_components = []
+        self._solver_lock = threading.Lock()
+        
+        # Called with each intermediate solution when set (see iter_solve())
+        self.on_solution = None
+        
+        self.search_workers = DEFAULT_SEARCH_WORKERS
+        self.tuner = default_tuner()
+    
+    def cancel(self):
+        """Stop the solve from another thread; the current search ends early."""
+        with self._solver_lock:
+            self.cancelled = True
+            if self._active_solver is not None:
+                self._active_solver.StopSearch()
+            for component in self._active_components:
+                component.cancel()
+    
+    def iter_solve(self, timeout_seconds=60):
+        """Solve in a background thread, yielding each improving solution as it is found."""
+        events = queue.Queue()
+        started = time.monotonic()
+        
+        def publish(event):
+            event['elapsed'] = round(time.monotonic() - started, 3)
+            events.put(event)
+        
+        def run():
+            try:
+                result = self.solve(timeout_seconds=timeout_seconds)
+            except Exception as e:
+                result = {'success': False, 'error': str(e)}
+            events.put({'event': 'result', **result})
+        
+        self.on_solution = publish
+        worker = threading.Thread(target=run, daemon=True)
+        worker.start()
+        
+        try:
+            while True:
+                event = events.get()
+                yield event
+                if event['event'] == 'result':
+                    break
+        finally:
+            if worker.is_alive():
+                self.cancel()
+    
+    def _run_solver(self, solver, model, week_schedules=None, first_week=1):
+        with self._solver_lock:
+            if self.cancelled:
+                return cp_model.UNKNOWN
+            self._active_solver = solver
+        try:
+            if self.on_solution is not None and week_schedules is not None:
+                return solver.Solve(model, SolutionStreamCallback(self, week_schedules, first_week))
+            return solver.Solve(model)
+        finally:
+            with self._solver_lock:
+                self._active_solver = None
+        
+    def solve_single_week(self, week_num, previous_solutions=None, deadline=None, weeks_left=1):
+        if deadline is None:
+            deadline = SolveDeadline(30)
+        
+        model = self._new_model()
         solver = cp_model.CpSolver()
         
-        schedule = {}
-        for shift_idx in range(len(self.shifts)):
-            schedule[shift_idx] = {}
-            for staff_idx in range(len(self.staff)):
-                var_name = f'sh{shift_idx}_st{staff_idx}'
-                schedule[shift_idx][staff_idx] = model.NewBoolVar(var_name)
+        with deadline.phase('build'):
+            (schedule,), changes = self._build_week_model(model, week_num, previous_solutions)
+            self._set_objective(model, changes)
         
-        # Each shift must have exactly the required number of staff
-        for shift_idx in range(len(self.shifts)):
-            staff_required = self.shifts[shift_idx].get('staff_required', 1)
-            model.Add(sum(schedule[shift_idx][staff_idx] 
-                         for staff_idx in range(len(self.staff))) == staff_required)
+        # Alternatives come from the last week's model, and share its time
+        alternatives_left = self.alternatives - 1 if week_num == self.weeks else 0
+        tuning = self._configure_solver(solver, model, deadline.search_allowance(weeks_left + alternatives_left))
         
-        # Hours constraints: must get AT LEAST contracted hours, up to max hours
-        for staff_idx, staff in enumerate(self.staff):
-            contracted_hours = staff.get('contracted_hours', 0)
-            max_hours = staff.get('max_hours', contracted_hours) or contracted_hours
-            
-            if max_hours < contracted_hours:
-                max_hours = contracted_hours
-            
-            total_minutes = sum(
-                schedule[shift_idx][staff_idx] * 
-                self._get_shift_duration(self.shifts[shift_idx])
-                for shift_idx in range(len(self.shifts))
-            )
+        with deadline.phase('search'):
+            status = self._run_solver(solver, model, [schedule], first_week=week_num)
+        self._record_search(tuning, solver, model, status)
+        
+        if self.cancelled:
+            return {'success': False, 'error': 'Scheduling was cancelled.', 'cancelled': True}
+        
+        if status == cp_model.OPTIMAL or status == cp_model.FEASIBLE:
+            result = {
+                'success': True,
+                'solution': self._extract_solution(solver, schedule),
+                'violations': self.ledger.violations(solver),
+                'stats': self._search_stats(solver, model, status, week_num),
+            }
+            if alternatives_left:
+                with deadline.phase('alternatives'):
+                    result['alternatives'] = self._search_alternatives(solver, model, [schedule], deadline)
+            return result
+        else:
+            previous_count = len(previous_solutions) if previous_solutions else 0
+            search_stats = self._search_stats(solver, model, status, week_num)
+            if self.soft_constraints:
+                fallback = self._soft_fallback(model, [schedule], deadline)
+                if fallback is None:
+                    return {'success': False, 'error': 'The time limit ran out before any rota was found.', 'stats': search_stats}
+                return {**fallback[0], 'stats': search_stats}
+            with deadline.phase('diagnostics'):
+                explained = self._explain_failure(
+                    lambda explain_model: self._build_week_model(explain_model, week_num, previous_solutions),
+                    week_num, deadline,
+                )
+                if explained is not None:
+                    return {**explained, 'stats': search_stats}
+                diagnostic = self._generate_solve_failure_diagnostic(week_num, previous_count)
+            if status == cp_model.UNKNOWN:
+                diagnostic += "\n\n(The time limit ran out before a rota or a proof of infeasibility was found.)"
+            return {'success': False, 'error': diagnostic, 'stats': search_stats}
+    
+    def _build_week_model(self, model, week_num, previous_solutions=None):
+        """Variables and constraints for one week; returns ([schedule], change indicators)."""
+        self.ledger.week = week_num
+        schedule = self._create_week_variables(model)
+        works = self._add_week_constraints(model, schedule)
+        if week_num == 1:
+            self._add_boundary_constraints(model, schedule, works)
+        
+        # Variety constraint for multi-week schedules
+        if previous_solutions is not None and len(previous_solutions) > 0:
+            with self.ledger.family('variety'):
+                for prev_week, prev_solution in enumerate(previous_solutions, 1):
+                    self._add_variety_constraint(model, schedule, prev_solution, f'week {prev_week}')
+        
+        self._add_symmetry_breaking(model, [schedule], previous_solutions or [])
+        
+        changes = self._add_previous_schedule_hints(model, schedule, week_num)
+        return [schedule], changes
+    
+    def solve_joint_weeks(self, deadline=None):
+        """Solve every week in one model so cross-week rules are native constraints."""
+        if deadline is None:
+            deadline = SolveDeadline(60)
+        
+        model = self._new_model()
+        solver = cp_model.CpSolver()
+        
+        with deadline.phase('build'):
+            week_schedules, changes = self._build_joint_model(model)
+            self._set_objective(model, changes)
+        
+        tuning = self._configure_solver(solver, model, deadline.search_allowance(self.alternatives))
+        
+        with deadline.phase('search'):
+            status = self._run_solver(solver, model, week_schedules)
+        self._record_search(tuning, solver, model, status)
+        
+        if self.cancelled:
+            return {'success': False, 'error': 'Scheduling was cancelled.', 'cancelled': True}
+        
+        if status == cp_model.OPTIMAL or status == cp_model.FEASIBLE:
+            results = []
+            for schedule in week_schedules:
+                results.append({
+                    'success': True,
+                    'solution': self._extract_solution(solver, schedule),
+                    'stats': None,
+                })
+            # The joint solve is a single search, so its stats and violations are reported once
+            results[0]['stats'] = self._search_stats(solver, model, status, f'1-{self.weeks}')
+            results[0]['violations'] = self.ledger.violations(solver)
+            if self.alternatives > 1:
+                with deadline.phase('alternatives'):
+                    results[-1]['alternatives'] = self._search_alternatives(solver, model, week_schedules, deadline)
+            return {'success': True, 'results': results}
+        else:
+            search_stats = self._search_stats(solver, model, status, f'1-{self.weeks}')
+            if self.soft_constraints:
+                fallback = self._soft_fallback(model, week_schedules, deadline)
+                if fallback is None:
+                    return {'success': False, 'error': 'The time limit ran out before any rota was found.', 'stats': search_stats}
+                fallback[0]['stats'] = search_stats
+                return {'success': True, 'results': fallback}
+            with deadline.phase('diagnostics'):
+                explained = self._explain_failure(self._build_joint_model, f'1-{self.weeks}', deadline)
+                if explained is not None:
+                    return {**explained, 'stats': search_stats}
+                diagnostic = self._generate_solve_failure_diagnostic(f'1-{self.weeks}', self.weeks - 1)
+            if status == cp_model.UNKNOWN:
+                diagnostic += "\n\n(The time limit ran out before a rota or a proof of infeasibility was found.)"
+            return {'success': False, 'error': diagnostic, 'stats': search_stats}
+    
+    def _build_joint_model(self, model):
+        """Variables and constraints for the whole horizon; returns (week schedules, change indicators)."""
+        week_schedules = []
+        week_works = []
+        for week in range(self.weeks):
+            self.ledger.week = week + 1
+            schedule = self._create_week_variables(model, prefix=f'w{week}_')
+            works = self._add_week_constraints(model, schedule, prefix=f'w{week}_')
+            week_schedules.append(schedule)
+            week_works.append(works)
+        
+        self.ledger.week = 1
+        self._add_boundary_constraints(model, week_schedules[0], week_works[0])
+        
+        # Variety: every week must differ from every earlier week, as in sequential mode
+        with self.ledger.family('variety'):
+            for later in range(1, self.weeks):
+                self.ledger.week = later + 1
+                for earlier in range(later):
+                    self._add_variety_constraint(
+                        model, week_schedules[later], week_schedules[earlier], f'week {earlier + 1}'
+                    )
+        
+        self.ledger.week = f'1-{self.weeks}'
+        
+        if self._rule_enabled('max_consecutive_days'):
+            max_days = self._get_rule_value('max_consecutive_days', 6)
+            with self.ledger.family('max_consecutive_days'):
+                self._add_cross_week_consecutive_constraints(model, week_works, max_days)
+        
+        if self._rule_enabled('fair_weekend_distribution'):
+            with self.ledger.family('fair_weekend_distribution'):
+                self._add_horizon_weekend_fairness(model, week_works)
+        
+        if self._rule_enabled('rest_between_shifts'):
+            # Sunday night to the following Monday morning
+            with self.ledger.family('rest_between_shifts'):
+                for week in range(1, self.weeks):
+                    self._add_rest_constraints(
+                        model, week_schedules[week - 1], DAY_ORDER[-1], week_schedules[week], DAY_ORDER[0]
+                    )
+        
+        self._add_symmetry_breaking(model, week_schedules)
+        
+        changes = []
+        for week, schedule in enumerate(week_schedules):
+            changes.extend(self._add_previous_schedule_hints(model, schedule, week + 1))
+        return week_schedules, changes
+    
+    def _soft_fallback(self, model, week_schedules, deadline):
+        """Per-week results for the empty rota, when a soft search ran out of time without one."""
+        # Every soft limit has slack, so the empty rota always satisfies the model
+        for schedule in week_schedules:
+            for var in schedule.values():
+                model.Add(var == 0)
+        
+        solver = cp_model.CpSolver()
+        solver.parameters.num_search_workers = 1
+        solver.parameters.max_time_in_seconds = max(1.0, deadline.remaining())
+        with deadline.phase('search'):
+            status = self._run_solver(solver, model)
+        if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+            return None
+        
+        results = [{'success': True, 'solution': set(), 'stats': None, 'fallback': True} for _ in week_schedules]
+        results[0]['violations'] = self.ledger.violations(solver)
+        return results
+    
+    def _search_alternatives(self, solver, model, week_schedules, deadline):
+        """Re-solve a finished model for other rotas, cutting off each rota found."""
+        found = [self._extract_solution(solver, schedule) for schedule in week_schedules]
+        distance = self.alternative_distance
+        if distance is None:
+            distance = max(1, sum(len(solution) for solution in found) // 10)
+        
+        alternatives = []
+        for searches_left in range(self.alternatives - 1, 0, -1):
+            kept = [schedule[pair] for schedule, solution in zip(week_schedules, found) for pair in solution]
+            model.Add(sum(kept) <= len(kept) - distance)
             
-            if contracted_hours > 0:
-                model.Add(total_minutes >= (contracted_hours * 60) - 60)
+            solver.parameters.max_time_in_seconds = deadline.search_allowance(searches_left)
+            status = self._run_solver(solver, model)
+            if self.cancelled or status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+                break
             
-            model.Add(total_minutes <= max_hours * 60)
+            found = [self._extract_solution(solver, schedule) for schedule in week_schedules]
+            alternative = {'solutions': found, 'wall_time': solver.WallTime()}
+            if model.HasObjective():
+                alternative['objective'] = solver.ObjectiveValue()
+            if self.soft_constraints:
+                alternative['penalty'] = sum(v['penalty'] for v in self.ledger.violations(solver))
+            alternatives.append(alternative)
         
-        # Availability constraint (handles legacy boolean, AM/PM, and new time-window format)
-        for shift_idx, shift in enumerate(self.shifts):
-            shift_day = shift['day'].lower()
-            shift_start = self._parse_time(shift['start_time'])
-            shift_end = self._parse_time(shift['end_time'])
-            if shift_end <= shift_start:
-                shift_end += 1440
-            is_morning = shift_start < 12 * 60  # Before noon = AM shift (for legacy format)
-            
-            for staff_idx, staff in enumerate(self.staff):
-                availability = staff.get('availability', {})
-                day_availability = availability.get(shift_day, True)
-                
-                is_available = True
-                
+        # Stable, so equally good rotas stay in the order they were found
+        alternatives.sort(key=lambda alternative: alternative.get('objective', 0))
+        return alternatives
+    
+    def _new_model(self, explain=False):
+        model = cp_model.CpModel()
+        self.ledger = ConstraintLedger(
+            model, soft=self.soft_constraints and not explain, weights=self.penalty_weights, explain=explain
+        )
+        return model
+    
+    def _explain_failure(self, build_model, week_label, deadline):
+        """Name the requirements that conflict, from an infeasible core of assumptions."""
+        budget = min(deadline.remaining(), max(deadline.diagnostics_reserve, 5.0))
+        started = time.monotonic()
+        
+        def time_left():
+            return budget - (time.monotonic() - started)
+        
+        model = self._new_model(explain=True)
+        build_model(model)
+        ledger = self.ledger
+        core = list(ledger.guards.values())
+        
+        solver = cp_model.CpSolver()
+        solver.parameters.num_search_workers = 1
+        
+        def is_conflict(assumptions):
+            model.ClearAssumptions()
+            model.AddAssumptions(assumptions)
+            solver.parameters.max_time_in_seconds = max(0.05, time_left())
+            return self._run_solver(solver, model) == cp_model.INFEASIBLE
+        
+        if not core or not is_conflict(core):
+            return None
+        found = set(solver.SufficientAssumptionsForInfeasibility())
+        core = [guard for guard in core if guard.Index() in found]
+        
+        for index in [guard.Index() for guard in core]:
+            if self.cancelled or time_left() <= 0.05:
+                break
+            trial = [guard for guard in core if guard.Index() != index]
+            if len(trial) == len(core) or not trial:
+                continue
+            if is_conflict(trial):
+                found = set(solver.SufficientAssumptionsForInfeasibility())
+                core = [guard for guard in trial if guard.Index() in found]
+        
+        diagnostics = []
+        for entry in ledger.describe(core):
+            diagnostics.append({'check': 'conflict', **entry, 'problem': self._describe_requirement(entry)})
+        
+        output = f"Cannot generate week {week_label}. These requirements can't all be met together:\n\n"
+        for i, diagnostic in enumerate(diagnostics, 1):
+            output += f"{i}. {diagnostic['problem']}\n"
+        output += "\nTo fix this, relax at least one of them (availability, hours, shifts or rules)."
+        return {'success': False, 'error': output, 'diagnostics': diagnostics}
+    
+    def _describe_requirement(self, entry):
+        group, subject, week = entry['constraint'], entry['subject'], entry['week']
+        if group == 'coverage':
+            return f"Week {week}: {subject} must have all the staff it requires"
+        if group == 'contract_hours':
+            return f"Week {week}: {subject} must get their contracted hours"
+        if group == 'max_hours':
+            return f"Week {week}: {subject} must stay within their max hours"
+        if group == 'variety':
+            return f"Week {week} must be different enough from {subject}"
+        rule_name = group.replace('_', ' ')
+        if isinstance(week, int):
+            return f"Week {week}: the {rule_name} rule"
+        return f"Weeks {week}: the {rule_name} rule across week boundaries"
+    
+    def _set_objective(self, model, changes):
+        """Minimise broken limits first (soft mode), then changes from the previous rota."""
+        objective = []
+        if self.soft_constraints and self.ledger.slacks:
+            objective.append(self.ledger.penalty())
+        if self.minimise_changes and changes:
+            objective.append(sum(changes))
+        if objective:
+            model.Minimize(sum(objective))
+    
+    def _configure_solver(self, solver, model, time_limit):
+        tuning = self.tuner.tune(
+            len(model.Proto().variables), model.HasObjective(), time_limit, self.search_workers,
+            soft=self.soft_constraints,
+        )
+        solver.parameters.max_time_in_seconds = tuning['max_time_in_seconds']
+        solver.parameters.num_search_workers = tuning['num_workers']
+        solver.parameters.linearization_level = tuning['linearization_level']
+        solver.parameters.max_presolve_iterations = tuning['max_presolve_iterations']
+        if self.seed is not None:
+            # The seed alone rarely changes the first feasible rota; permuting variables does
+            solver.parameters.random_seed = int(self.seed) % (2 ** 31)
+            solver.parameters.permute_variable_randomly = True
+        return tuning
+    
+    def _search_stats(self, solver, model, status, week):
+        """Outcome and model size of one search, reported per week (or joint horizon)."""
+        stats = {
+            'week': week,
+            'status': solver.StatusName(status),
+            'wall_time': solver.WallTime(),
+            'branches': solver.NumBranches(),
+            'conflicts': solver.NumConflicts(),
+            'model': self.ledger.model_size(),
+        }
+        if model.HasObjective() and status in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+            objective = solver.ObjectiveValue()
+            bound = solver.BestObjectiveBound()
+            stats['objective'] = objective
+            stats['best_bound'] = bound
+            stats['gap'] = round(abs(objective - bound) / max(1.0, abs(objective)), 6)
+        return stats
+    
+    def _record_search(self, tuning, solver, model, status):
+        if self.cancelled:
+            return
+        # FEASIBLE means the limit cut an optimisation short; a plain rota search reports OPTIMAL
+        hit_limit = status == cp_model.UNKNOWN or (status == cp_model.FEASIBLE and model.HasObjective())
+        self.tuner.record(tuning, solver.WallTime(), solver.NumBranches(), status == cp_model.OPTIMAL, hit_limit)
+    
+    def _compile_eligibility(self):
+        """Normalise every availability format once into a shift x staff boolean matrix."""
+        day_names = sorted({shift['day'].lower() for shift in self.shifts})
+        day_index = {day: i for i, day in enumerate(day_names)}
+        
+        shift_day = np.array([day_index[s['day'].lower()] for s in self.shifts], dtype=np.int64)
+        shift_start = np.array(self.catalogue.start, dtype=np.int64)
+        shift_end = np.array(self.catalogue.end, dtype=np.int64)
+        is_morning = shift_start < 12 * 60  # Before noon = AM shift (for legacy format)
+        
+        # Per staff and day: available at all, the allowed window, and AM/PM flags
+        shape = (len(self.staff), len(day_names))
+        day_available = np.ones(shape, dtype=bool)
+        window_start = np.zeros(shape, dtype=np.int64)
+        window_end = np.full(shape, 2 * 1440, dtype=np.int64)
+        am_available = np.ones(shape, dtype=bool)
+        pm_available = np.ones(shape, dtype=bool)
+        
+        for staff_idx, staff in enumerate(self.staff):
+            availability = staff.get('availability', {})
+            for day, i in day_index.items():
+                day_availability = availability.get(day, True)
                 if isinstance(day_availability, dict):
                     if 'available' in day_availability:
                         # New time-window format: { available: bool, start: "HH:MM", end: "HH:MM" }
                         if not day_availability.get('available', True):
-                            is_available = False
+                            day_available[staff_idx, i] = False
                         elif day_availability.get('start') and day_availability.get('end'):
-                            # Staff has specific availability window - shift must fit within it
                             avail_start = self._parse_time(day_availability['start'])
                             avail_end = self._parse_time(day_availability['end'])
                             if avail_end <= avail_start:
                                 avail_end += 1440
-                            # Block if shift starts before availability or ends after
-                            if shift_start < avail_start or shift_end > avail_end:
-                                is_available = False
+                            window_start[staff_idx, i] = avail_start
+                            window_end[staff_idx, i] = avail_end
                     else:
                         # Legacy AM/PM format: { AM: bool, PM: bool }
-                        if is_morning:
-                            is_available = day_availability.get('AM', True)
-                        else:
-                            is_available = day_availability.get('PM', True)
+                        am_available[staff_idx, i] = bool(day_availability.get('AM', True))
+                        pm_available[staff_idx, i] = bool(day_availability.get('PM', True))
                 elif isinstance(day_availability, bool):
                     # Old format: True/False for whole day
-                    is_available = day_availability
+                    day_available[staff_idx, i] = day_availability
+        
+        # Index every per-day array by each shift's day -> shape (shifts, staff)
+        eligible = day_available[:, shift_day].T
+        # Shift must fit within the availability window
+        eligible &= (shift_start[:, None] >= window_start[:, shift_day].T)
+        eligible &= (shift_end[:, None] <= window_end[:, shift_day].T)
+        eligible &= np.where(is_morning[:, None], am_available[:, shift_day].T, pm_available[:, shift_day].T)
+        return eligible
+    
+    def _create_week_variables(self, model, prefix=''):
+        """Sparse week schedule: {(shift_idx, staff_idx): BoolVar} over eligible pairs only."""
+        schedule = {}
+        with self.ledger.family('assignments'):
+            for shift_idx, staff_idx in self.eligible_pairs:
+                schedule[shift_idx, staff_idx] = model.NewBoolVar(f'{prefix}sh{shift_idx}_st{staff_idx}')
+        return schedule
+    
+    
+    def _add_week_constraints(self, model, schedule, prefix=''):
+        # Each shift must have exactly the required number of staff
+        with self.ledger.family('coverage'):
+            for shift_idx, shift in enumerate(self.shifts):
+                staff_required = shift.get('staff_required', 1)
+                assigned = sum(schedule[shift_idx, staff_idx] for staff_idx in self.staff_for_shift[shift_idx])
+                shift_label = f"{shift['day']} {shift.get('name', f'Shift {shift_idx + 1}')}"
+                self.ledger.require('coverage', shift_label, assigned, lower=staff_required, upper=staff_required)
+        
+        # Hours constraints: must get AT LEAST contracted hours, up to max hours
+        with self.ledger.family('hours'):
+            for staff_idx, staff in enumerate(self.staff):
+                contracted_hours = staff.get('contracted_hours', 0)
+                max_hours = staff.get('max_hours', contracted_hours) or contracted_hours
+                
+                if max_hours < contracted_hours:
+                    max_hours = contracted_hours
+                
+                total_minutes = sum(
+                    schedule[shift_idx, staff_idx] * self.catalogue.duration[shift_idx]
+                    for shift_idx in self.shifts_for_staff[staff_idx]
+                )
                 
-                if not is_available:
-                    model.Add(schedule[shift_idx][staff_idx] == 0)
+                if contracted_hours > 0:
+                    self.ledger.require(
+                        'contract_hours', staff['name'], total_minutes,
+                        lower=(contracted_hours * 60) - 60, unit=60,
+                    )
+                
+                self.ledger.require('max_hours', staff['name'], total_minutes, upper=max_hours * 60, unit=60)
         
         # ============================================================
         # HARD CONSTRAINT: Maximum 1 shift per staff per day
         # ============================================================
-        shifts_by_day = {}
+        with self.ledger.family('one_shift_per_day'):
+            works = self._build_work_indicators(model, schedule, prefix)
+        
+        # Add optional rules
+        self._add_rules_to_model(model, schedule, works)
+        
+        return works
+    
+    def _build_work_indicators(self, model, schedule, prefix=''):
+        """One 0/1 'works' indicator per staff and day, shared by every day-based rule."""
+        works = [{} for _ in self.staff]
+        for staff_idx, day_shifts in enumerate(self.staff_day_shifts):
+            for day, shift_indices_on_day in day_shifts.items():
+                day_vars = [schedule[shift_idx, staff_idx] for shift_idx in shift_indices_on_day]
+                if len(day_vars) == 1:
+                    works[staff_idx][day] = day_vars[0]
+                else:
+                    worked = model.NewBoolVar(f'{prefix}st{staff_idx}_{day}_worked')
+                    model.Add(worked == sum(day_vars))
+                    works[staff_idx][day] = worked
+        return works
+    
+    def _add_variety_constraint(self, model, schedule, prev_schedule, prev_label):
+        """Require a minimum number of changed assignments versus another week."""
+        differences = []
+        for pair, var in schedule.items():
+            if isinstance(prev_schedule, set):
+                differences.append(1 - var if pair in prev_schedule else var)
+            else:
+                diff = model.NewBoolVar('')
+                model.AddBoolXOr([var, prev_schedule[pair], diff.Not()])
+                differences.append(diff)
+        
+        min_changes = max(3, (len(self.shifts) * 9) // 10)
+        self.ledger.require('variety', prev_label, sum(differences), lower=min_changes)
+    
+    def _index_previous_schedule(self, previous_schedule):
+        """Map a formatted schedule back to {week: {(shift_idx, staff_idx), ...}}."""
+        shift_lookup = {}
         for shift_idx, shift in enumerate(self.shifts):
-            day = shift['day']
-            if day not in shifts_by_day:
-                shifts_by_day[day] = []
-            shifts_by_day[day].append(shift_idx)
+            key = (shift['day'], shift.get('name', f"Shift {shift_idx + 1}"), shift['start_time'], shift['end_time'])
+            shift_lookup.setdefault(key, shift_idx)
+        staff_lookup = {staff['id']: staff_idx for staff_idx, staff in enumerate(self.staff)}
+        
+        assignments = {}
+        for week_data in previous_schedule:
+            week_pairs = assignments.setdefault(week_data['week'], set())
+            for shift in week_data['shifts']:
+                key = (shift['day'], shift['shift_name'], shift['start_time'], shift['end_time'])
+                shift_idx = shift_lookup.get(key)
+                staff_idx = staff_lookup.get(shift['staff_id'])
+                if shift_idx is not None and staff_idx is not None:
+                    week_pairs.add((shift_idx, staff_idx))
+        return assignments
+    
+    def _add_previous_schedule_hints(self, model, schedule, week_num):
+        """Hint the previous rota for this week and return its change indicators."""
+        previous = self.previous_assignments.get(week_num)
+        if previous is None:
+            return []
+        
+        changes = []
+        for pair, var in schedule.items():
+            if pair in previous:
+                model.AddHint(var, 1)
+                changes.append(1 - var)
+            else:
+                model.AddHint(var, 0)
+                changes.append(var)
+        # Old assignments the staff member is no longer available for are forced changes
+        changes.extend(1 for pair in previous if pair not in schedule)
+        return changes
+    
+    def _index_boundary_state(self, boundary_state):
+        """Map {staff_id: state} to {staff_idx: (consecutive days, last shift end, closed)}."""
+        staff_lookup = {str(staff['id']): staff_idx for staff_idx, staff in enumerate(self.staff)}
         
-        for day, shift_indices_on_day in shifts_by_day.items():
-            for staff_idx in range(len(self.staff)):
-                model.Add(
-                    sum(schedule[shift_idx][staff_idx] for shift_idx in shift_indices_on_day) <= 1
-                )
+        boundary = {}
+        for staff_id, state in boundary_state.items():
+            staff_idx = staff_lookup.get(str(staff_id))
+            if staff_idx is None:
+                self.warnings.append(f"boundary_state has an entry for staff id {staff_id}, who isn't in this rota; it was ignored")
+                continue
+            last_end = None
+            closed = False
+            if state.get('last_shift_day') in DAY_ORDER and state.get('last_shift_end'):
+                start = parse_time(state.get('last_shift_start') or '00:00')
+                end = parse_time(state['last_shift_end'])
+                if end <= start:
+                    end += 1440
+                day_idx = DAY_ORDER.index(state['last_shift_day'])
+                last_end = (day_idx - len(DAY_ORDER)) * 1440 + end
+                closed = day_idx == len(DAY_ORDER) - 1 and end >= CLOSING_END_MINUTES
+            boundary[staff_idx] = (int(state.get('consecutive_days') or 0), last_end, closed)
+        return boundary
+    
+    def _export_boundary_state(self, solutions):
+        """The boundary_state a rolling-horizon caller passes with the week after these."""
+        last_shift = {}
+        # (week, day position) pairs each staff member works
+        days_worked = {}
+        for week, solution in enumerate(solutions):
+            for shift_idx, staff_idx in solution:
+                day_idx = self.catalogue.day_position[shift_idx]
+                if day_idx is None:
+                    continue
+                days_worked.setdefault(staff_idx, set()).add((week, day_idx))
+                if week == len(solutions) - 1 and (staff_idx not in last_shift or day_idx > last_shift[staff_idx][0]):
+                    last_shift[staff_idx] = (day_idx, shift_idx)
         
-        # Add optional rules
-        self._add_rules_to_model(model, schedule)
+        boundary_state = {}
+        horizon_days = len(solutions) * len(DAY_ORDER)
+        for staff_idx, (day_idx, shift_idx) in sorted(last_shift.items()):
+            run = 0
+            while run < horizon_days and divmod(horizon_days - 1 - run, len(DAY_ORDER)) in days_worked[staff_idx]:
+                run += 1
+            if run == horizon_days:
+                # Worked every day solved here, so the run carried in continues
+                run += self.boundary.get(staff_idx, (0, None, False))[0]
+            shift = self.shifts[shift_idx]
+            boundary_state[str(self.staff[staff_idx]['id'])] = {
+                'consecutive_days': run,
+                'last_shift_day': shift['day'],
+                'last_shift_start': shift['start_time'],
+                'last_shift_end': shift['end_time'],
+            }
+        return boundary_state
+    
+    def _add_boundary_constraints(self, model, schedule, works):
+        """Carry the previous week's rules into this one from the boundary state."""
+        catalogue = self.catalogue
         
-        # Variety constraint for multi-week schedules
-        if previous_solutions is not None and len(previous_solutions) > 0:
-            for prev_solution in previous_solutions:
-                differences = []
-                for shift_idx in range(len(self.shifts)):
-                    for staff_idx in range(len(self.staff)):
-                        if prev_solution.get(shift_idx, {}).get(staff_idx, 0) == 1:
-                            differences.append(1 - schedule[shift_idx][staff_idx])
-                        else:
-                            differences.append(schedule[shift_idx][staff_idx])
-                
-                min_changes = max(3, (len(self.shifts) * 9) // 10)
-                model.Add(sum(differences) >= min_changes)
+        for staff_idx, (run, last_end, closed) in self.boundary.items():
+            name = self.staff[staff_idx]['name']
+            
+            if run and self._rule_enabled('max_consecutive_days'):
+                max_days = self._get_rule_value('max_consecutive_days', 6)
+                run = min(run, max_days)
+                # The window of the run plus the next few days; longer windows reach past Sunday
+                window_days = max_days + 1 - run
+                window = [works[staff_idx][day] for day in DAY_ORDER[:window_days] if day in works[staff_idx]]
+                if window_days <= len(DAY_ORDER) and len(window) > max_days - run:
+                    with self.ledger.family('max_consecutive_days'):
+                        self.ledger.require(
+                            'max_consecutive_days', f"{name}, from the previous week",
+                            sum(window), upper=max_days - run,
+                        )
+            
+            if last_end is None:
+                continue
+            
+            if self._rule_enabled('rest_between_shifts'):
+                min_rest_minutes = int(round(self._get_rule_value('rest_between_shifts', 12) * 60))
+                too_soon = [
+                    schedule[shift_idx, staff_idx] for shift_idx in self.shifts_for_staff[staff_idx]
+                    if catalogue.day_position[shift_idx] is not None
+                    and catalogue.day_position[shift_idx] * 1440 + catalogue.start[shift_idx] - last_end < min_rest_minutes
+                ]
+                if too_soon:
+                    with self.ledger.family('rest_between_shifts'):
+                        self.ledger.require(
+                            'rest_between_shifts', f"{name}, after the previous week", sum(too_soon), upper=0,
+                        )
+            
+            if closed and self._rule_enabled('no_clopening'):
+                opens = [
+                    schedule[shift_idx, staff_idx]
+                    for shift_idx in self.staff_day_shifts[staff_idx].get(DAY_ORDER[0], [])
+                    if catalogue.opening[shift_idx]
+                ]
+                if opens:
+                    with self.ledger.family('no_clopening'):
+                        self.ledger.require('no_clopening', f"{name}, previous Sunday", sum(opens), upper=0)
+    
+    def _interchangeable_staff(self, previous_solutions=()):
+        """Classes of two or more staff that any rota can swap without changing its cost."""
+        def rows(pairs):
+            staff_rows = [[] for _ in self.staff]
+            for shift_idx, staff_idx in sorted(pairs):
+                staff_rows[staff_idx].append(shift_idx)
+            return [tuple(row) for row in staff_rows]
         
-        solver.parameters.max_time_in_seconds = 30
-        solver.parameters.num_search_workers = 8
+        history = [rows(pairs) for _, pairs in sorted(self.previous_assignments.items())]
+        history += [rows(solution) for solution in previous_solutions]
         
-        status = solver.Solve(model)
+        classes = {}
+        for staff_idx, staff in enumerate(self.staff):
+            contracted_hours = staff.get('contracted_hours', 0)
+            max_hours = max(staff.get('max_hours', contracted_hours) or contracted_hours, contracted_hours)
+            key = (
+                contracted_hours,
+                max_hours,
+                tuple(self.shifts_for_staff[staff_idx]),
+                self.boundary.get(staff_idx),
+                tuple(week_rows[staff_idx] for week_rows in history),
+            )
+            classes.setdefault(key, []).append(staff_idx)
+        return [members for members in classes.values() if len(members) > 1]
+    
+    def _add_symmetry_breaking(self, model, week_schedules, previous_solutions=()):
+        """Order interchangeable staff by minutes worked, so fewer swapped rotas are searched."""
+        # Joint and soft models measured slower with it; explain mode drops limits per person
+        if self.ledger.explain or self.soft_constraints or len(week_schedules) > 1:
+            return
         
-        if status == cp_model.OPTIMAL or status == cp_model.FEASIBLE:
-            solution = {}
-            for shift_idx in range(len(self.shifts)):
-                solution[shift_idx] = {}
-                for staff_idx in range(len(self.staff)):
-                    solution[shift_idx][staff_idx] = solver.Value(schedule[shift_idx][staff_idx])
+        (schedule,) = week_schedules
+        duration = self.catalogue.duration
+        with self.ledger.family('symmetry'):
+            for members in self._interchangeable_staff(previous_solutions):
+                shift_indices = self.shifts_for_staff[members[0]]
+                minutes = [
+                    sum(duration[idx] * schedule[idx, staff_idx] for idx in shift_indices)
+                    for staff_idx in members
+                ]
+                for first, second in zip(minutes, minutes[1:]):
+                    model.Add(first >= second)
+    
+    def _add_cross_week_consecutive_constraints(self, model, week_works, max_days):
+        # Windows fully inside a week are handled per week; only add the ones spanning a boundary
+        for staff_idx in range(len(self.staff)):
+            timeline = [works[staff_idx].get(day) for works in week_works for day in DAY_ORDER]
             
-            return {
-                'success': True,
-                'solution': solution,
-                'stats': {
-                    'wall_time': solver.WallTime(),
-                    'branches': solver.NumBranches(),
-                }
-            }
-        else:
-            diagnostic = self._generate_solve_failure_diagnostic(week_num, previous_solutions)
-            return {'success': False, 'error': diagnostic}
+            for start in range(len(timeline) - max_days):
+                end = start + max_days
+                if start // 7 == end // 7:
+                    continue
+                window = [v for v in timeline[start:end + 1] if v is not None]
+                if len(window) > max_days:
+                    self.ledger.require(
+                        'max_consecutive_days', f"{self.staff[staff_idx]['name']}, from week {start // 7 + 1} {DAY_ORDER[start % 7]}",
+                        sum(window), upper=max_days,
+                    )
+    
+    def _add_horizon_weekend_fairness(self, model, week_works):
+        if not self.catalogue.weekend_shift_count():
+            return
+        
+        # Full weekends worked over the whole horizon may differ by at most one between
+        # the staff who could work one; the rest would pin the fewest at zero
+        fewest = model.NewIntVar(0, self.weeks, 'fewest_full_weekends')
+        most = model.NewIntVar(0, self.weeks, 'most_full_weekends')
+        for staff_idx in range(len(self.staff)):
+            full_weekends = []
+            for week, works in enumerate(week_works):
+                worked = [works[staff_idx].get(day) for day in WEEKEND_DAYS]
+                if any(v is None for v in worked):
+                    continue
+                full = model.NewBoolVar(f'w{week}_st{staff_idx}_full_weekend')
+                model.AddMinEquality(full, worked)
+                full_weekends.append(full)
+            if not full_weekends:
+                continue
+            total = sum(full_weekends)
+            model.Add(total >= fewest)
+            model.Add(total <= most)
+        self.ledger.require('fair_weekend_distribution', 'full weekends across staff', most - fewest, upper=1)
+    
+    def _extract_solution(self, solver, schedule):
+        """The set of (shift_idx, staff_idx) pairs assigned in the solution."""
+        return {pair for pair, var in schedule.items() if solver.Value(var)}
     
-    def _generate_solve_failure_diagnostic(self, week_num, previous_solutions):
+    def _generate_solve_failure_diagnostic(self, week_num, previous_count):
         total_contracted = sum(s.get('contracted_hours', 0) for s in self.staff)
         total_max_hours = sum(s.get('max_hours', s.get('contracted_hours', 0)) for s in self.staff)
         total_shift_hours = 0
-        for shift in self.shifts:
-            shift_hours = self._get_shift_duration(shift) / 60
+        for shift_idx, shift in enumerate(self.shifts):
+            shift_hours = self.catalogue.duration[shift_idx] / 60
             staff_required = shift.get('staff_required', 1)
             total_shift_hours += shift_hours * staff_required
         
@@ -196,31 +1487,24 @@ class ShiftlyScheduler:
                 else:
                     actions.append(f"Reduce {staff['name']}'s contracted hours to {int(max_possible)}h or less")
         
-        if previous_solutions and len(previous_solutions) >= 3:
-            problems.append(f"Week {week_num} can't find enough variation from the previous {len(previous_solutions)} weeks")
+        if previous_count >= 3:
+            problems.append(f"Week {week_num} can't find enough variation from the previous {previous_count} weeks")
             actions.append(f"Try generating fewer weeks at once (e.g., 1-2 weeks instead of {week_num})")
         
-        shift_durations = set()
-        for shift in self.shifts:
-            duration = self._get_shift_duration_hours(shift['start_time'], shift['end_time'])
-            shift_durations.add(duration)
+        shift_durations = [minutes / 60 for minutes in self.catalogue.durations]
+        reachability = self.catalogue.reachability()
         
         for staff in self.staff:
             contracted = staff.get('contracted_hours', 0)
             if contracted > 0:
-                can_build = self._can_build_hours(contracted, sorted(shift_durations), max_shifts=7)
+                can_build = reachability.can_build(contracted * 60 - 30, contracted * 60 + 30)
                 if not can_build:
-                    durations_list = ', '.join([f"{int(d) if d == int(d) else d}h" for d in sorted(shift_durations)])
+                    durations_list = ', '.join([f"{int(d) if d == int(d) else d}h" for d in shift_durations])
                     problems.append(f"{staff['name']}'s {contracted}h contract can't be built from shift lengths: {durations_list}")
                     
-                    possible_hours = []
-                    for test_hours in range(contracted - 5, contracted + 6):
-                        if test_hours > 0 and self._can_build_hours(test_hours, sorted(shift_durations), max_shifts=7):
-                            possible_hours.append(test_hours)
-                    
-                    if possible_hours:
-                        closest = min(possible_hours, key=lambda x: abs(x - contracted))
-                        actions.append(f"Change {staff['name']}'s contract to {closest}h, or add different shift lengths (e.g., 5h or 9h shifts)")
+                    closest = reachability.closest(contracted * 60)
+                    if 0 < closest and abs(closest - contracted * 60) <= 5 * 60:
+                        actions.append(f"Change {staff['name']}'s contract to {closest / 60:g}h, or add different shift lengths (e.g., 5h or 9h shifts)")
         
         if problems:
             output = f"Cannot generate week {week_num}:\n\n"
@@ -233,480 +1517,542 @@ class ShiftlyScheduler:
         else:
             return f"Week {week_num} couldn't be generated. Try reducing the number of weeks or adjusting availability."
     
-    def _add_rules_to_model(self, model, schedule):
-        shifts_by_day = {}
-        for shift_idx, shift in enumerate(self.shifts):
-            day = shift['day']
-            if day not in shifts_by_day:
-                shifts_by_day[day] = []
-            shifts_by_day[day].append(shift_idx)
+    def _add_rules_to_model(self, model, schedule, works):
+        rules = [
+            ('no_clopening', self._add_no_clopening_rule),
+            ('rest_between_shifts', self._add_rest_rule),
+            ('max_consecutive_days', self._add_max_consecutive_days_rule),
+            ('fair_weekend_distribution', self._add_weekend_fairness_rule),
+            ('minimum_days_off', self._add_minimum_days_off_rule),
+        ]
+        for rule_name, add_rule in rules:
+            if self._rule_enabled(rule_name):
+                with self.ledger.family(rule_name):
+                    add_rule(model, schedule, works)
+    
+    def _add_no_clopening_rule(self, model, schedule, works):
+        catalogue = self.catalogue
         
-        if self._rule_enabled('no_clopening'):
-            day_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-            for staff_idx in range(len(self.staff)):
-                for day_idx in range(len(day_order) - 1):
-                    current_day = day_order[day_idx]
-                    next_day = day_order[day_idx + 1]
-                    
-                    closing_shifts = [
-                        idx for idx, s in enumerate(self.shifts)
-                        if s['day'] == current_day and self._is_closing_shift(s)
-                    ]
-                    opening_shifts = [
-                        idx for idx, s in enumerate(self.shifts)
-                        if s['day'] == next_day and self._is_opening_shift(s)
-                    ]
-                    
-                    for closing_idx in closing_shifts:
-                        for opening_idx in opening_shifts:
-                            model.Add(
-                                schedule[closing_idx][staff_idx] +
-                                schedule[opening_idx][staff_idx] <= 1
-                            )
+        for staff_idx, day_shifts in enumerate(self.staff_day_shifts):
+            for day_idx in range(len(DAY_ORDER) - 1):
+                current_day = DAY_ORDER[day_idx]
+                next_day = DAY_ORDER[day_idx + 1]
+                
+                # At most one shift per day, so each sum is itself a 0/1 indicator
+                closes = [
+                    schedule[idx, staff_idx] for idx in day_shifts.get(current_day, [])
+                    if catalogue.closing[idx]
+                ]
+                opens = [
+                    schedule[idx, staff_idx] for idx in day_shifts.get(next_day, [])
+                    if catalogue.opening[idx]
+                ]
+                if closes and opens:
+                    self.ledger.require(
+                        'no_clopening', f"{self.staff[staff_idx]['name']}, {current_day}",
+                        sum(closes) + sum(opens), upper=1,
+                    )
+    
+    def _add_rest_rule(self, model, schedule, works):
+        for day_idx in range(len(DAY_ORDER) - 1):
+            self._add_rest_constraints(model, schedule, DAY_ORDER[day_idx], schedule, DAY_ORDER[day_idx + 1])
+    
+    def _add_max_consecutive_days_rule(self, model, schedule, works):
+        max_days = self._get_rule_value('max_consecutive_days', 6)
         
-        if self._rule_enabled('max_consecutive_days'):
-            max_days = self._get_rule_value('max_consecutive_days', 6)
-            day_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-            
+        for staff_idx in range(len(self.staff)):
+            for start_day_idx in range(len(DAY_ORDER) - max_days):
+                window_days = DAY_ORDER[start_day_idx:start_day_idx + max_days + 1]
+                days_worked_vars = [works[staff_idx][day] for day in window_days if day in works[staff_idx]]
+                
+                if len(days_worked_vars) > max_days:
+                    self.ledger.require(
+                        'max_consecutive_days', f"{self.staff[staff_idx]['name']}, from {window_days[0]}",
+                        sum(days_worked_vars), upper=max_days,
+                    )
+    
+    def _add_weekend_fairness_rule(self, model, schedule, works):
+        fair_share = self.weekend_fair_share
+        
+        if fair_share is not None:
             for staff_idx in range(len(self.staff)):
-                for start_day_idx in range(len(day_order) - max_days):
-                    window_days = day_order[start_day_idx:start_day_idx + max_days + 1]
-                    
-                    days_worked_vars = []
-                    for day in window_days:
-                        day_shifts = [idx for idx, s in enumerate(self.shifts) if s['day'] == day]
-                        if day_shifts:
-                            day_worked = model.NewBoolVar(f'st{staff_idx}_{day}_worked')
-                            model.AddMaxEquality(
-                                day_worked,
-                                [schedule[idx][staff_idx] for idx in day_shifts]
-                            )
-                            days_worked_vars.append(day_worked)
-                    
-                    if days_worked_vars:
-                        model.Add(sum(days_worked_vars) <= max_days)
+                # One shift per day, so weekend shifts worked == weekend days worked
+                staff_weekend_shifts = sum(
+                    works[staff_idx][day] for day in WEEKEND_DAYS if day in works[staff_idx]
+                )
+                self.ledger.require(
+                    'fair_weekend_distribution', self.staff[staff_idx]['name'], staff_weekend_shifts,
+                    lower=max(0, fair_share - 1), upper=fair_share + 2,
+                )
+    
+    def _add_minimum_days_off_rule(self, model, schedule, works):
+        max_days_worked = len(DAY_ORDER) - self._get_rule_value('minimum_days_off', 2)
         
-        if self._rule_enabled('fair_weekend_distribution'):
-            weekend_days = ['Saturday', 'Sunday']
-            weekend_shift_indices = [
-                idx for idx, s in enumerate(self.shifts) if s['day'] in weekend_days
-            ]
-            
-            if weekend_shift_indices:
-                total_weekend_shifts = len(weekend_shift_indices)
-                fair_share = total_weekend_shifts // len(self.staff)
-                
-                for staff_idx in range(len(self.staff)):
-                    staff_weekend_shifts = sum(
-                        schedule[idx][staff_idx] for idx in weekend_shift_indices
+        for staff_idx in range(len(self.staff)):
+            if len(works[staff_idx]) > max_days_worked:
+                self.ledger.require(
+                    'minimum_days_off', self.staff[staff_idx]['name'],
+                    sum(works[staff_idx].values()), upper=max_days_worked,
+                )
+    
+    def _add_rest_constraints(self, model, schedule, day, next_schedule, next_day):
+        """Forbid shift pairs on adjacent days that leave less than the minimum rest."""
+        min_rest_minutes = int(round(self._get_rule_value('rest_between_shifts', 12) * 60))
+        conflicts = self.catalogue.rest_conflicts(min_rest_minutes)
+        
+        for staff_idx, day_shifts in enumerate(self.staff_day_shifts):
+            next_shifts = day_shifts.get(next_day, [])
+            if not next_shifts:
+                continue
+            for shift_idx in day_shifts.get(day, []):
+                too_soon = conflicts.get(shift_idx)
+                if not too_soon:
+                    continue
+                clashes = [next_schedule[idx, staff_idx] for idx in next_shifts if idx in too_soon]
+                # At most one shift on the next day, so one constraint covers every clash
+                if clashes:
+                    self.ledger.require(
+                        'rest_between_shifts', f"{self.staff[staff_idx]['name']}, {day}",
+                        schedule[shift_idx, staff_idx] + sum(clashes), upper=1,
                     )
-                    model.Add(staff_weekend_shifts >= max(0, fair_share - 1))
-                    model.Add(staff_weekend_shifts <= fair_share + 2)
+    
+    def preflight(self):
+        """Reject input that can't possibly be scheduled, before any model is built."""
+        # Soft mode turns these limits into penalties
+        if self.soft_constraints:
+            return None
+        
+        diagnostics = self._screen_feasibility()
+        if not diagnostics:
+            return None
+        
+        output = "Cannot generate this rota:\n\n"
+        for i, diagnostic in enumerate(diagnostics, 1):
+            output += f"{i}. {diagnostic['problem']}\n"
+        output += "\nTo fix this:\n"
+        for diagnostic in diagnostics:
+            output += f"- {diagnostic['action']}\n"
+        return {'success': False, 'error': output.strip(), 'diagnostics': diagnostics}
+    
+    def _screen_feasibility(self):
+        """Necessary conditions of the hard model, checked in a few milliseconds."""
+        diagnostics = []
+        catalogue = self.catalogue
+        required = np.array([shift.get('staff_required', 1) for shift in self.shifts], dtype=np.int64)
+        demand_minutes = int(np.dot(np.array(catalogue.duration, dtype=np.int64), required))
+        
+        # Coverage: enough staff available for every shift
+        eligible_counts = self.eligible.sum(axis=1)
+        for shift_idx in np.flatnonzero(eligible_counts < required):
+            shift = self.shifts[shift_idx]
+            shift_label = f"{shift['day']} {shift.get('name', f'Shift {shift_idx + 1}')}"
+            diagnostics.append({
+                'check': 'coverage',
+                'subject': shift_label,
+                'problem': f"{shift_label} ({shift['start_time']}-{shift['end_time']}) needs {required[shift_idx]} staff but only {eligible_counts[shift_idx]} are available for it",
+                'action': f"Make more staff available on {shift['day']} from {shift['start_time']} to {shift['end_time']}, or reduce the staff required",
+            })
+        
+        max_days_worked = len(DAY_ORDER)
+        if self._rule_enabled('minimum_days_off'):
+            max_days_worked -= self._get_rule_value('minimum_days_off', 2)
+        
+        total_capacity = 0
+        total_floor = 0
+        for staff_idx, staff in enumerate(self.staff):
+            contracted_hours = staff.get('contracted_hours', 0)
+            max_hours = max(staff.get('max_hours', contracted_hours) or contracted_hours, contracted_hours)
+            
+            # Longest shift they could take on each available day, best days first
+            best_per_day = sorted(
+                (max(catalogue.duration[idx] for idx in day_shifts) for day_shifts in self.staff_day_shifts[staff_idx].values()),
+                reverse=True,
+            )[:max_days_worked]
+            most_minutes = sum(best_per_day)
+            total_capacity += min(most_minutes, max_hours * 60)
+            
+            if contracted_hours <= 0:
+                continue
+            floor_minutes = contracted_hours * 60 - 60
+            total_floor += floor_minutes
+            
+            if most_minutes < floor_minutes:
+                diagnostics.append({
+                    'check': 'staff_availability',
+                    'subject': staff['name'],
+                    'problem': f"{staff['name']} needs {contracted_hours}h but can work at most {most_minutes / 60:.0f}h (shifts available on {len(best_per_day)} days)",
+                    'action': f"Make {staff['name']} available for more or longer shifts, or reduce their contracted hours to {int(most_minutes / 60) + 1}h or less",
+                })
+                continue
+            
+            durations = {catalogue.duration[idx] for idx in self.shifts_for_staff[staff_idx]}
+            reachability = catalogue.reachability(durations)
+            if not reachability.can_build(floor_minutes, max_hours * 60, max_shifts=len(best_per_day)):
+                durations_list = ', '.join(
+                    f"{int(d / 60) if d % 60 == 0 else d / 60}h" for d in reachability.durations
+                )
+                diagnostics.append({
+                    'check': 'contract_lengths',
+                    'subject': staff['name'],
+                    'problem': f"{staff['name']}'s {contracted_hours}h contract can't be built from the shift lengths they're available for: {durations_list}",
+                    'action': f"Change {staff['name']}'s contracted or max hours, or add shifts of different lengths",
+                })
+        
+        if total_capacity < demand_minutes:
+            diagnostics.append({
+                'check': 'capacity',
+                'subject': None,
+                'problem': f"Your staff can work up to {total_capacity / 60:.0f}h but shifts need {demand_minutes / 60:.0f}h",
+                'action': f"Increase max hours or availability, add staff, or remove {(demand_minutes - total_capacity) / 60:.0f}h of shifts",
+            })
+        if total_floor > demand_minutes:
+            diagnostics.append({
+                'check': 'contracted_hours',
+                'subject': None,
+                'problem': f"Your staff need at least {total_floor / 60:.0f}h (contracted, less an hour each) but shifts only provide {demand_minutes / 60:.0f}h",
+                'action': f"Add {(total_floor - demand_minutes) / 60:.0f}h+ of shifts, or reduce contracted hours",
+            })
+        
+        return diagnostics
     
     def solve(self, timeout_seconds=60):
+        deadline = SolveDeadline(timeout_seconds)
+        
+        with deadline.phase('preflight'):
+            rejection = self.preflight()
+        if rejection is not None:
+            return {**rejection, 'cancelled': False, 'stats': deadline.report()}
+        
+        components = self._independent_components()
+        if components is not None:
+            print(f"Solving {len(components)} independent groups of staff...", file=sys.stderr)
+            return self._solve_components(components, deadline)
+        
+        if self.multi_week_mode == 'joint' and self.weeks > 1:
+            print(f"Solving weeks 1-{self.weeks} jointly...", file=sys.stderr)
+            joint_result = self.solve_joint_weeks(deadline)
+            if not joint_result['success']:
+                return self._failure_response(joint_result, deadline)
+            return self._build_response(joint_result['results'], deadline)
+        
         results = []
         all_previous_solutions = []
         
         for week in range(self.weeks):
             print(f"Solving week {week + 1}...", file=sys.stderr)
             
-            week_result = self.solve_single_week(week + 1, all_previous_solutions)
+            week_result = self.solve_single_week(
+                week + 1, all_previous_solutions,
+                deadline=deadline, weeks_left=self.weeks - week
+            )
             
             if not week_result['success']:
-                return {
-                    'success': False,
-                    'error': week_result['error'],
-                }
+                return self._failure_response(week_result, deadline)
             
             results.append(week_result)
             all_previous_solutions.append(week_result['solution'])
         
-        schedule = self._format_schedule(results)
-        self._check_contract_hours(schedule)
+        return self._build_response(results, deadline)
+    
+    def _independent_components(self):
+        """Groups of staff and shifts that share no eligible pair, as [(shift indices, staff indices)]."""
+        if not self.data.get('decompose', True) or self.weeks > 1 or self.alternatives > 1:
+            return None
+        if self.on_solution is not None:
+            return None
+        
+        # Union-find over shifts (0..n-1) and staff (n..n+m-1)
+        shift_count = len(self.shifts)
+        parent = list(range(shift_count + len(self.staff)))
         
-        rule_compliance = self._validate_rules(schedule)
+        def find(node):
+            while parent[node] != node:
+                parent[node] = parent[parent[node]]
+                node = parent[node]
+            return node
         
-        total_time = sum(r['stats']['wall_time'] for r in results)
+        for shift_idx, staff_idx in self.eligible_pairs:
+            parent[find(shift_idx)] = find(shift_count + staff_idx)
         
-        return {
-            'success': True,
-            'status': 'FEASIBLE',
-            'schedule': schedule,
-            'contract_issues': self.contract_issues,
-            'rule_compliance': rule_compliance,
-            'stats': {
-                'wall_time': total_time,
-                'branches': sum(r['stats']['branches'] for r in results),
-            }
-        }
+        groups = {}
+        for node in range(len(parent)):
+            shift_indices, staff_indices = groups.setdefault(find(node), ([], []))
+            if node < shift_count:
+                shift_indices.append(node)
+            else:
+                staff_indices.append(node - shift_count)
+        
+        components = [group for group in groups.values() if group[0] and group[1]]
+        if len(components) < 2:
+            return None
+        
+        # Shifts nobody can work and staff with no shifts join the largest group
+        components.sort(key=lambda group: len(group[0]) * len(group[1]), reverse=True)
+        for shift_indices, staff_indices in groups.values():
+            if not (shift_indices and staff_indices):
+                components[0][0].extend(shift_indices)
+                components[0][1].extend(staff_indices)
+        return [(sorted(shift_indices), sorted(staff_indices)) for shift_indices, staff_indices in components]
     
-    def _validate_rules(self, schedule):
-        compliance = []
+    def _solve_components(self, components, deadline):
+        from decompose import solve_components
         
-        double_shift_violations = self._check_no_double_shifts(schedule)
-        if len(double_shift_violations) == 0:
-            compliance.append({
-                'rule': 'No Double Shifts',
-                'status': 'followed',
-                'details': 'No staff member works more than one shift per day.',
-                'violations': []
-            })
-        else:
-            compliance.append({
-                'rule': 'No Double Shifts',
-                'status': 'compromised',
-                'details': f'Found {len(double_shift_violations)} double shift assignment(s).',
-                'violations': double_shift_violations
+        payloads = []
+        for shift_indices, staff_indices in components:
+            shifts = []
+            for shift_idx in shift_indices:
+                # Keep the default names of unnamed shifts from the whole site
+                shifts.append({'name': f"Shift {shift_idx + 1}", **self.shifts[shift_idx]})
+            staff_ids = {str(self.staff[staff_idx]['id']) for staff_idx in staff_indices}
+            payloads.append({
+                **self.data,
+                'boundary_state': {
+                    staff_id: state for staff_id, state in (self.data.get('boundary_state') or {}).items()
+                    if str(staff_id) in staff_ids
+                },
+                'staff': [self.staff[staff_idx] for staff_idx in staff_indices],
+                'shifts': shifts,
+                'decompose': False,
             })
         
-        if self._rule_enabled('rest_between_shifts'):
-            min_hours = self._get_rule_value('rest_between_shifts', 12)
-            rest_violations = self._check_overnight_rest(schedule, min_hours=min_hours)
-            if len(rest_violations) == 0:
-                compliance.append({
-                    'rule': f'Overnight Rest ({min_hours}+ hours)',
-                    'status': 'followed',
-                    'details': f'All staff have at least {min_hours} hours rest between shifts on consecutive days.',
-                    'violations': []
-                })
-            else:
-                compliance.append({
-                    'rule': f'Overnight Rest ({min_hours}+ hours)',
-                    'status': 'compromised',
-                    'details': f'Found {len(rest_violations)} case(s) of insufficient overnight rest.',
-                    'violations': rest_violations
-                })
+        with deadline.phase('components'):
+            responses = solve_components(
+                payloads, deadline.remaining(), self.search_workers, self.weekend_fair_share,
+                large=len(self.eligible_pairs) >= PARALLEL_COMPONENT_PAIRS,
+                is_cancelled=lambda: self.cancelled,
+                on_start=self._track_component,
+            )
+        with self._solver_lock:
+            self._active_components = []
         
-        if self._rule_enabled('no_clopening'):
-            violations = self._check_no_clopening(schedule)
-            if len(violations) == 0:
-                compliance.append({
-                    'rule': 'No Clopening',
-                    'status': 'followed',
-                    'details': 'No staff member works a closing shift followed by an opening shift the next day.',
-                    'violations': []
-                })
-            else:
-                compliance.append({
-                    'rule': 'No Clopening',
-                    'status': 'compromised',
-                    'details': f'Found {len(violations)} clopening occurrence(s).',
-                    'violations': violations
-                })
+        if self.cancelled:
+            return {'success': False, 'error': 'Scheduling was cancelled.', 'cancelled': True, 'stats': deadline.report()}
+        return self._merge_components(components, responses, deadline)
+    
+    def _track_component(self, scheduler):
+        with self._solver_lock:
+            self._active_components.append(scheduler)
+            if self.cancelled:
+                scheduler.cancel()
+    
+    def _merge_components(self, components, responses, deadline):
+        """One response for the whole site from the responses of its components."""
+        summaries = []
+        for index, ((shift_indices, staff_indices), response) in enumerate(zip(components, responses), 1):
+            summary = {
+                'component': index,
+                'staff': [self.staff[staff_idx]['name'] for staff_idx in staff_indices],
+                'shifts': len(shift_indices),
+                'success': response.get('success', False),
+            }
+            if not summary['success']:
+                summary['error'] = response.get('error')
+                if response.get('diagnostics'):
+                    summary['diagnostics'] = response['diagnostics']
+            summaries.append(summary)
         
-        if self._rule_enabled('fair_weekend_distribution'):
-            weekend_patterns = self._check_fair_weekends(schedule)
-            
-            full_weekends_worked = {name: data['full_weekends_worked'] for name, data in weekend_patterns.items()}
-            min_full_weekends = min(full_weekends_worked.values()) if full_weekends_worked else 0
-            max_full_weekends = max(full_weekends_worked.values()) if full_weekends_worked else 0
-            difference = max_full_weekends - min_full_weekends
-            
-            if difference <= 1:
-                compliance.append({
-                    'rule': 'Fair Weekend Distribution',
-                    'status': 'followed',
-                    'details': f'Weekend patterns are fairly distributed. Max difference in full weekends worked: {difference}.',
-                    'violations': []
-                })
-            else:
-                weekend_violations = []
-                for staff_name, patterns in sorted(weekend_patterns.items(), key=lambda x: x[1]['full_weekends_worked'], reverse=True):
-                    full_worked = patterns['full_weekends_worked']
-                    partial = patterns['partial_weekends']
-                    full_off = patterns['full_weekends_off']
-                    
-                    if full_worked > min_full_weekends + 1:
-                        weekend_violations.append({
-                            'staff': staff_name,
-                            'day': 'Weekends',
-                            'week': 'All weeks',
-                            'issue': f'{full_worked} full weekend{"s" if full_worked != 1 else ""} worked, {partial} partial, {full_off} completely off',
-                            'solution': f'Consider rotating full weekends more evenly - aim for {min_full_weekends}-{min_full_weekends + 1} full weekends per person'
-                        })
-                
-                compliance.append({
-                    'rule': 'Fair Weekend Distribution',
-                    'status': 'compromised',
-                    'details': f'Weekend distribution varies by {difference} full weekends. Some staff work more full weekends than others.',
-                    'violations': weekend_violations
-                })
+        searches = [
+            {**search, 'component': summary['component']}
+            for summary, response in zip(summaries, responses)
+            for search in (response.get('stats') or {}).get('searches', [])
+        ]
+        stats = {
+            'wall_time': sum(search['wall_time'] for search in searches),
+            'branches': sum(search['branches'] for search in searches),
+            'conflicts': sum(search['conflicts'] for search in searches),
+            **deadline.report(),
+            'searches': searches,
+            'components': len(components),
+            'peak_rss_mb': max(
+                [peak_rss_mb()] + [(response.get('stats') or {}).get('peak_rss_mb', 0) for response in responses]
+            ),
+        }
         
-        if self._rule_enabled('max_consecutive_days'):
-            max_days = self._get_rule_value('max_consecutive_days', 6)
-            violations = self._check_max_consecutive(schedule, max_days)
-            
-            if len(violations) == 0:
-                compliance.append({
-                    'rule': f'Maximum {max_days} Consecutive Days',
-                    'status': 'followed',
-                    'details': f'No staff member works more than {max_days} consecutive days.',
-                    'violations': []
-                })
-            else:
-                compliance.append({
-                    'rule': f'Maximum {max_days} Consecutive Days',
-                    'status': 'compromised',
-                    'details': f'Found {len(violations)} case(s) of too many consecutive working days.',
-                    'violations': violations
-                })
+        failed = [summary for summary in summaries if not summary['success']]
+        if failed:
+            # Groups that did solve still report their rota, so only the failing group needs fixing
+            for summary, response in zip(summaries, responses):
+                if summary['success']:
+                    summary['schedule'] = response['schedule']
+            output = f"{len(failed)} of {len(components)} independent groups of staff couldn't be scheduled:\n\n"
+            for summary in failed:
+                output += f"Group {summary['component']} ({', '.join(summary['staff'])}):\n{summary['error']}\n\n"
+            return {
+                'success': False,
+                'error': output.strip(),
+                'cancelled': False,
+                'components': summaries,
+                'stats': stats,
+            }
         
-        if self._rule_enabled('minimum_days_off'):
-            min_days_off = self._get_rule_value('minimum_days_off', 2)
-            days_off_violations = self._check_minimum_days_off(schedule, min_days_off=min_days_off)
-            if len(days_off_violations) == 0:
-                compliance.append({
-                    'rule': f'Minimum {min_days_off} Days Off',
-                    'status': 'followed',
-                    'details': f'All staff have at least {min_days_off} days off per week.',
-                    'violations': []
-                })
-            else:
-                compliance.append({
-                    'rule': f'Minimum {min_days_off} Days Off',
-                    'status': 'compromised',
-                    'details': f'Found {len(days_off_violations)} case(s) of insufficient days off.',
-                    'violations': days_off_violations
-                })
+        # Back into whole-site shift order, as _format_schedule would have produced it
+        shift_order = {}
+        for shift_idx, shift in enumerate(self.shifts):
+            key = (shift['day'], shift.get('name', f"Shift {shift_idx + 1}"), shift['start_time'], shift['end_time'])
+            shift_order.setdefault(key, shift_idx)
+        with deadline.phase('format'):
+            schedule = []
+            for week_num in range(1, self.weeks + 1):
+                week_shifts = [
+                    shift for response in responses for week_data in response['schedule']
+                    if week_data['week'] == week_num for shift in week_data['shifts']
+                ]
+                week_shifts.sort(key=lambda shift: shift_order[
+                    shift['day'], shift['shift_name'], shift['start_time'], shift['end_time']
+                ])
+                schedule.append({'week': week_num, 'shifts': week_shifts})
+            self._check_contract_hours(schedule)
         
-        return compliance
-    
-    def _check_no_double_shifts(self, schedule):
-        violations = []
+        # Weekend fairness is judged across the whole site
+        with deadline.phase('validation'):
+            rule_compliance = self._validate_rules(schedule)
+        stats.update(deadline.report())
         
-        for week_data in schedule:
-            shifts_by_day_staff = {}
-            
-            for shift in week_data['shifts']:
-                staff = shift['staff_name']
-                day = shift['day']
-                key = f"{staff}_{day}"
-                
-                if key not in shifts_by_day_staff:
-                    shifts_by_day_staff[key] = []
-                shifts_by_day_staff[key].append(shift)
-            
-            for key, shifts_list in shifts_by_day_staff.items():
-                if len(shifts_list) > 1:
-                    staff_name = shifts_list[0]['staff_name']
-                    day = shifts_list[0]['day']
-                    shift_names = [s['shift_name'] for s in shifts_list]
-                    
-                    violations.append({
-                        'staff': staff_name,
-                        'day': day,
-                        'week': f"Week {week_data['week']}",
-                        'issue': f"Assigned to {len(shifts_list)} shifts: {', '.join(shift_names)}",
-                        'solution': f"Remove one shift or assign to different staff"
-                    })
+        response = {
+            'success': True,
+            'status': 'FEASIBLE',
+            'schedule': schedule,
+            'contract_issues': self.contract_issues,
+            'rule_compliance': rule_compliance,
+            'stats': stats,
+        }
         
-        return violations
-    
-    def _check_overnight_rest(self, schedule, min_hours=12):
-        violations = []
-        day_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+        if self.previous_assignments:
+            changes = {}
+            for r in responses:
+                for change in r.get('changes_from_previous', []):
+                    week_changes = changes.setdefault(change['week'], {'week': change['week'], 'added': 0, 'removed': 0})
+                    week_changes['added'] += change['added']
+                    week_changes['removed'] += change['removed']
+            response['changes_from_previous'] = [changes[week] for week in sorted(changes)]
         
-        for week_data in schedule:
-            staff_shifts = {}
-            
-            for shift in week_data['shifts']:
-                staff = shift['staff_name']
-                if staff not in staff_shifts:
-                    staff_shifts[staff] = {}
-                day = shift['day']
-                if day not in staff_shifts[staff]:
-                    staff_shifts[staff][day] = []
-                staff_shifts[staff][day].append(shift)
-            
-            for staff, days_dict in staff_shifts.items():
-                for day_idx in range(len(day_order) - 1):
-                    current_day = day_order[day_idx]
-                    next_day = day_order[day_idx + 1]
-                    
-                    if current_day not in days_dict or next_day not in days_dict:
-                        continue
-                    
-                    current_shifts = days_dict[current_day]
-                    next_shifts = days_dict[next_day]
-                    
-                    latest_end = max([self._parse_time(s['end_time']) for s in current_shifts])
-                    if latest_end < 12 * 60:
-                        latest_end += 1440
-                    
-                    earliest_start = min([self._parse_time(s['start_time']) for s in next_shifts])
-                    earliest_start += 1440
-                    
-                    rest_minutes = earliest_start - latest_end
-                    rest_hours = rest_minutes / 60
-                    
-                    if rest_hours < min_hours:
-                        last_shift = max(current_shifts, key=lambda s: self._parse_time(s['end_time']))
-                        first_shift = min(next_shifts, key=lambda s: self._parse_time(s['start_time']))
-                        
-                        violations.append({
-                            'staff': staff,
-                            'day': f"{current_day}-{next_day}",
-                            'week': f"Week {week_data['week']}",
-                            'issue': f"Only {rest_hours:.1f}h rest between {last_shift['shift_name']} and {first_shift['shift_name']}",
-                            'solution': f"Swap {next_day}'s {first_shift['shift_name']} with another staff member"
-                        })
+        if self.soft_constraints:
+            response['violations'] = [v for r in responses for v in r['violations']]
+            response['penalty'] = sum(r['penalty'] for r in responses)
         
-        return violations
+        if any(r.get('fallback') for r in responses):
+            response['status'] = 'UNKNOWN'
+            response['fallback'] = True
+        
+        response['boundary_state'] = {}
+        for r in responses:
+            response['boundary_state'].update(r['boundary_state'])
+        if self.warnings:
+            response['warnings'] = self.warnings
+        return response
     
-    def _check_no_clopening(self, schedule):
-        violations = []
-        day_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+    def _failure_response(self, result, deadline):
+        response = {
+            'success': False,
+            'error': result['error'],
+            'cancelled': result.get('cancelled', False),
+            'stats': deadline.report(),
+        }
+        if result.get('stats'):
+            response['stats']['searches'] = [result['stats']]
+        if result.get('diagnostics'):
+            response['diagnostics'] = result['diagnostics']
+        if self.warnings:
+            response['warnings'] = self.warnings
+        return response
+    
+    def _build_response(self, results, deadline):
+        with deadline.phase('format'):
+            schedule = self._format_schedule(results)
+            self._check_contract_hours(schedule)
         
-        for week_data in schedule:
-            week_shifts_by_day = {}
-            for shift in week_data['shifts']:
-                day = shift['day']
-                if day not in week_shifts_by_day:
-                    week_shifts_by_day[day] = []
-                week_shifts_by_day[day].append(shift)
-            
-            for day_idx in range(len(day_order) - 1):
-                current_day = day_order[day_idx]
-                next_day = day_order[day_idx + 1]
-                
-                current_shifts = week_shifts_by_day.get(current_day, [])
-                next_shifts = week_shifts_by_day.get(next_day, [])
-                
-                closing_shifts = [s for s in current_shifts if self._is_closing_shift({'start_time': s['start_time'], 'end_time': s['end_time']})]
-                opening_shifts = [s for s in next_shifts if self._is_opening_shift({'start_time': s['start_time']})]
-                
-                for closing in closing_shifts:
-                    for opening in opening_shifts:
-                        if closing['staff_name'] == opening['staff_name']:
-                            violations.append({
-                                'staff': closing['staff_name'],
-                                'day': f"{current_day}-{next_day}",
-                                'week': f"Week {week_data['week']}",
-                                'issue': f"Closing shift ({closing['shift_name']}) followed by opening shift ({opening['shift_name']})",
-                                'solution': f"Swap {next_day}'s {opening['shift_name']} with another staff member"
-                            })
+        with deadline.phase('validation'):
+            rule_compliance = self._validate_rules(schedule)
         
-        return violations
-    
-    def _check_fair_weekends(self, schedule):
-        staff_weekend_patterns = {}
+        searches = [r['stats'] for r in results if r['stats'] is not None]
+        total_time = sum(s['wall_time'] for s in searches)
         
-        for staff in self.staff:
-            staff_weekend_patterns[staff['name']] = {
-                'full_weekends_worked': 0,
-                'partial_weekends': 0,
-                'full_weekends_off': 0,
-                'total_shifts': 0
+        response = {
+            'success': True,
+            'status': 'FEASIBLE',
+            'schedule': schedule,
+            'contract_issues': self.contract_issues,
+            'rule_compliance': rule_compliance,
+            'stats': {
+                'wall_time': total_time,
+                'branches': sum(s['branches'] for s in searches),
+                'conflicts': sum(s['conflicts'] for s in searches),
+                **deadline.report(),
+                'searches': searches,
+                'peak_rss_mb': peak_rss_mb(),
             }
+        }
         
-        for week_data in schedule:
-            staff_weekend_days = {}
-            for shift in week_data['shifts']:
-                if shift['day'] in ['Saturday', 'Sunday']:
-                    staff = shift['staff_name']
-                    if staff not in staff_weekend_days:
-                        staff_weekend_days[staff] = set()
-                    staff_weekend_days[staff].add(shift['day'])
-                    staff_weekend_patterns[staff]['total_shifts'] += 1
-            
-            for staff in self.staff:
-                staff_name = staff['name']
-                days_worked = staff_weekend_days.get(staff_name, set())
-                
-                if len(days_worked) == 2:
-                    staff_weekend_patterns[staff_name]['full_weekends_worked'] += 1
-                elif len(days_worked) == 1:
-                    staff_weekend_patterns[staff_name]['partial_weekends'] += 1
-                else:
-                    staff_weekend_patterns[staff_name]['full_weekends_off'] += 1
+        if self.previous_assignments:
+            response['changes_from_previous'] = self._count_changes(results)
         
-        return staff_weekend_patterns
-    
-    def _check_max_consecutive(self, schedule, max_days):
-        violations = []
-        day_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+        if results[-1].get('alternatives'):
+            response['alternatives'] = self._format_alternatives(results)
         
-        for week_data in schedule:
-            staff_worked_days = {}
-            
-            for shift in week_data['shifts']:
-                staff = shift['staff_name']
-                day = shift['day']
-                if staff not in staff_worked_days:
-                    staff_worked_days[staff] = set()
-                staff_worked_days[staff].add(day)
-            
-            for staff, days_worked in staff_worked_days.items():
-                consecutive = 0
-                max_consecutive = 0
-                consecutive_days = []
-                
-                for day in day_order:
-                    if day in days_worked:
-                        consecutive += 1
-                        consecutive_days.append(day)
-                        max_consecutive = max(max_consecutive, consecutive)
-                    else:
-                        if consecutive > max_days:
-                            violations.append({
-                                'staff': staff,
-                                'day': f"{consecutive_days[0]}-{consecutive_days[-1]}",
-                                'week': f"Week {week_data['week']}",
-                                'issue': f"Worked {consecutive} consecutive days",
-                                'solution': f"Add a day off during this period or reduce shift assignments"
-                            })
-                        consecutive = 0
-                        consecutive_days = []
-                
-                if consecutive > max_days:
-                    violations.append({
-                        'staff': staff,
-                        'day': f"{consecutive_days[0]}-{consecutive_days[-1]}",
-                        'week': f"Week {week_data['week']}",
-                        'issue': f"Worked {consecutive} consecutive days",
-                        'solution': f"Add a day off during this period or reduce shift assignments"
-                    })
+        if any(r.get('fallback') for r in results):
+            # A search ran out of time and left the empty rota in its place
+            response['status'] = 'UNKNOWN'
+            response['fallback'] = True
         
-        return violations
-    
-    def _check_minimum_days_off(self, schedule, min_days_off=2):
-        violations = []
+        # Pass this back as the next week's boundary_state
+        response['boundary_state'] = self._export_boundary_state([r['solution'] for r in results])
+        if self.warnings:
+            response['warnings'] = self.warnings
         
-        for week_data in schedule:
-            staff_worked_days = {}
-            
-            for shift in week_data['shifts']:
-                staff = shift['staff_name']
-                day = shift['day']
-                if staff not in staff_worked_days:
-                    staff_worked_days[staff] = set()
-                staff_worked_days[staff].add(day)
-            
-            for staff in self.staff:
-                worked_days = staff_worked_days.get(staff['name'], set())
-                days_off = 7 - len(worked_days)
-                
-                if days_off < min_days_off:
-                    violations.append({
-                        'staff': staff['name'],
-                        'day': 'Full week',
-                        'week': f"Week {week_data['week']}",
-                        'issue': f"Only {days_off} day(s) off this week",
-                        'solution': f"Remove {min_days_off - days_off} shift(s) or reduce contracted hours"
-                    })
+        if self.soft_constraints:
+            violations = [v for r in results for v in r.get('violations', [])]
+            response['violations'] = violations
+            response['penalty'] = sum(v['penalty'] for v in violations)
         
-        return violations
+        return response
+    
+    def _format_alternatives(self, results):
+        """Alternative rotas, ranked after the main one (rank 1)."""
+        formatted = []
+        for rank, alternative in enumerate(results[-1]['alternatives'], 2):
+            shared = results[:len(results) - len(alternative['solutions'])]
+            alt_results = shared + [{'solution': solution} for solution in alternative['solutions']]
+            entry = {
+                'rank': rank,
+                'schedule': self._format_schedule(alt_results),
+                'changes': sum(
+                    len(result['solution'] - alt['solution']) for result, alt in zip(results, alt_results)
+                ),
+            }
+            for key in ('objective', 'penalty'):
+                if key in alternative:
+                    entry[key] = alternative[key]
+            formatted.append(entry)
+        return formatted
     
-    def _format_schedule(self, results):
+    def _count_changes(self, results):
+        changes = []
+        for week_num, result in enumerate(results, 1):
+            previous = self.previous_assignments.get(week_num)
+            if previous is None:
+                continue
+            current = result['solution']
+            changes.append({
+                'week': week_num,
+                'added': len(current - previous),
+                'removed': len(previous - current),
+            })
+        return changes
+    
+    def _validate_rules(self, schedule):
+        return ComplianceValidator(self.staff, self.rules).validate(schedule)
+    
+    def _format_schedule(self, results, first_week=1):
         schedule = []
         
-        for week_num, result in enumerate(results, 1):
+        for week_num, result in enumerate(results, first_week):
             week_shifts = []
             solution = result['solution']
             
             for shift_idx, shift in enumerate(self.shifts):
-                for staff_idx, staff in enumerate(self.staff):
-                    if solution[shift_idx][staff_idx] == 1:
+                for staff_idx in self.staff_for_shift[shift_idx]:
+                    if (shift_idx, staff_idx) in solution:
+                        staff = self.staff[staff_idx]
                         week_shifts.append({
                             'week': week_num,
                             'day': shift['day'],
@@ -760,13 +2106,8 @@ class ShiftlyScheduler:
                 })
     
     def _diagnose_contract_mismatch(self, staff, actual, contracted):
-        shift_durations = set()
-        for shift in self.shifts:
-            duration = self._get_shift_duration_hours(shift['start_time'], shift['end_time'])
-            shift_durations.add(duration)
-        
-        sorted_durations = sorted(shift_durations)
-        can_build = self._can_build_hours(contracted, sorted_durations, max_shifts=7)
+        sorted_durations = [minutes / 60 for minutes in self.catalogue.durations]
+        can_build = self.catalogue.reachability().can_build(contracted * 60 - 30, contracted * 60 + 30)
         
         if not can_build:
             durations_list = [f"{int(d) if d == int(d) else d}h" for d in sorted_durations]
@@ -797,28 +2138,6 @@ class ShiftlyScheduler:
                 available_days.append(day)
         return available_days
     
-    def _can_build_hours(self, target, durations, max_shifts=7, tolerance=0.5):
-        possible = {0}
-        for _ in range(max_shifts):
-            new_possible = set(possible)
-            for hours in possible:
-                for duration in durations:
-                    new_hours = hours + duration
-                    if new_hours <= target + tolerance:
-                        new_possible.add(new_hours)
-            possible = new_possible
-            for hours in possible:
-                if abs(hours - target) <= tolerance:
-                    return True
-        return False
-    
-    def _get_shift_duration(self, shift):
-        start = self._parse_time(shift['start_time'])
-        end = self._parse_time(shift['end_time'])
-        if end <= start:
-            end += 1440
-        return end - start
-    
     def _get_shift_duration_hours(self, start_time, end_time):
         start = self._parse_time(start_time)
         end = self._parse_time(end_time)
@@ -827,8 +2146,7 @@ class ShiftlyScheduler:
         return (end - start) / 60
     
     def _parse_time(self, time_str):
-        hours, minutes = map(int, time_str.split(':'))
-        return hours * 60 + minutes
+        return parse_time(time_str)
     
     def _shifts_overlap(self, shift1, shift2):
         start1 = self._parse_time(shift1['start_time'])
@@ -843,38 +2161,41 @@ class ShiftlyScheduler:
         
         return not (end1 <= start2 or end2 <= start1)
     
-    def _is_closing_shift(self, shift):
-        end = self._parse_time(shift['end_time'])
-        if end < 12 * 60:
-            end += 1440
-        return end >= 22 * 60
-    
-    def _is_opening_shift(self, shift):
-        return self._parse_time(shift['start_time']) <= 8 * 60
-    
     def _rule_enabled(self, rule_name):
-        for rule in self.rules:
-            if rule.get('type') == rule_name or rule.get('name') == rule_name:
-                return rule.get('enabled', True)
-        return False
+        return rule_enabled(self.rules, rule_name)
     
     def _get_rule_value(self, rule_name, default):
-        for rule in self.rules:
-            if rule.get('type') == rule_name or rule.get('name') == rule_name:
-                return rule.get('value', default)
-        return default
+        return get_rule_value(self.rules, rule_name, default)
 
 
 def main():
+    if '--batch' in sys.argv[1:]:
+        return main_batch()
+    
     try:
         input_data = json.loads(sys.stdin.read())
         scheduler = ShiftlyScheduler(input_data)
-        result = scheduler.solve(timeout_seconds=60)
+        result = scheduler.solve(timeout_seconds=input_data.get('timeout_seconds', 60))
         print(json.dumps(result))
     except Exception as e:
         print(json.dumps({'success': False, 'error': str(e)}))
         sys.exit(1)
 
 
+def main_batch():
+    """Solve { sites: [payload, ...], timeout_seconds? } from stdin, one JSON line per site."""
+    from batch import iter_batch
+    
+    try:
+        input_data = json.loads(sys.stdin.read())
+        sites = input_data['sites'] if isinstance(input_data, dict) else input_data
+        timeout = input_data.get('timeout_seconds', 60) if isinstance(input_data, dict) else 60
+        for event in iter_batch(sites, timeout_seconds=timeout):
+            print(json.dumps(event), flush=True)
+    except Exception as e:
+        print(json.dumps({'success': False, 'error': str(e)}))
+        sys.exit(1)
+
+
 if __name__ == '__main__':
     main()
\ No newline at end of file
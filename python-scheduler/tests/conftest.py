@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The scheduler modules are run as scripts from python-scheduler/, not installed
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
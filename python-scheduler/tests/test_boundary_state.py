@@ -0,0 +1,98 @@
+from benchmark import generate_payload
+from scheduler import DAY_ORDER, ShiftlyScheduler, parse_time
+
+
+def test_lowercase_day_names_still_solve():
+    payload = generate_payload(0, 8)
+    for shift in payload['shifts']:
+        shift['day'] = shift['day'].lower()
+    result = ShiftlyScheduler(payload).solve(timeout_seconds=10)
+    assert result['success'], result.get('error')
+    # Days outside DAY_ORDER carry nothing into the next week
+    assert result['boundary_state'] == {}
+
+
+def integer_id_payload(seed):
+    # The Next.js caller sends numeric staff ids
+    payload = generate_payload(seed, 10)
+    for i, staff in enumerate(payload['staff']):
+        staff['id'] = i + 1
+    return payload
+
+
+def test_boundary_state_round_trips_through_json():
+    from app import app
+    
+    client = app.test_client()
+    first = client.post('/schedule', json=integer_id_payload(1)).get_json()
+    assert first['success'], first.get('error')
+    assert first['boundary_state']
+    
+    follow_up = dict(integer_id_payload(1), boundary_state=first['boundary_state'], seed=2)
+    scheduler = ShiftlyScheduler(follow_up)
+    assert len(scheduler.boundary) == len(first['boundary_state'])
+    assert scheduler.warnings == []
+    
+    second = client.post('/schedule', json=follow_up).get_json()
+    assert second['success'], second.get('error')
+    assert 'warnings' not in second
+
+
+def test_boundary_state_for_unknown_staff_warns():
+    payload = dict(integer_id_payload(1), boundary_state={'999': {'consecutive_days': 3}})
+    result = ShiftlyScheduler(payload).solve(timeout_seconds=10)
+    assert result['success'], result.get('error')
+    assert len(result['warnings']) == 1
+
+
+def test_boundary_rules_hold_across_weeks():
+    # A seed whose second week breaks both rules when the boundary is ignored
+    payload = integer_id_payload(6)
+    rules = {rule['type']: rule.get('value') for rule in payload['rules']}
+    first = ShiftlyScheduler(payload).solve(timeout_seconds=10)
+    second = ShiftlyScheduler(dict(payload, boundary_state=first['boundary_state'], seed=1)).solve(timeout_seconds=10)
+    assert second['success'], second.get('error')
+    
+    def shifts_by_staff(result):
+        by_staff = {}
+        for shift in result['schedule'][0]['shifts']:
+            by_staff.setdefault(shift['staff_id'], {})[DAY_ORDER.index(shift['day'])] = shift
+        return by_staff
+    
+    before, after = shifts_by_staff(first), shifts_by_staff(second)
+    for staff_id in before.keys() | after.keys():
+        days = before.get(staff_id, {})
+        days = {**days, **{day + 7: shift for day, shift in after.get(staff_id, {}).items()}}
+        
+        run = longest = 0
+        for day in range(14):
+            run = run + 1 if day in days else 0
+            longest = max(longest, run)
+        assert longest <= rules['max_consecutive_days']
+        
+        if 6 in days and 7 in days:
+            end = parse_time(days[6]['end_time'])
+            if end <= parse_time(days[6]['start_time']):
+                end += 1440
+            assert parse_time(days[7]['start_time']) + 1440 - end >= rules['rest_between_shifts'] * 60
+
+
+def test_run_through_a_whole_week_carries_the_incoming_run():
+    rules = [{'type': 'max_consecutive_days', 'enabled': True, 'value': 10}]
+    
+    def one_person(days, hours):
+        return {
+            'staff': [{'id': 7, 'name': 'Solo', 'contracted_hours': hours, 'max_hours': hours,
+                       'availability': {day.lower(): True for day in DAY_ORDER}}],
+            'shifts': [{'name': 'Day', 'day': day, 'start_time': '09:00', 'end_time': '17:00'} for day in days],
+            'rules': rules,
+        }
+    
+    incoming = {'7': {'consecutive_days': 3, 'last_shift_day': 'Sunday', 'last_shift_start': '09:00', 'last_shift_end': '17:00'}}
+    full_week = ShiftlyScheduler(dict(one_person(DAY_ORDER, 56), boundary_state=incoming)).solve(timeout_seconds=10)
+    assert full_week['success'], full_week.get('error')
+    assert full_week['boundary_state']['7']['consecutive_days'] == 10
+    
+    # A Monday shift would be the eleventh day in a row
+    monday = dict(one_person(['Monday'], 8), boundary_state=full_week['boundary_state'])
+    assert not ShiftlyScheduler(monday).solve(timeout_seconds=10)['success']
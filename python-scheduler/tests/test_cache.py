@@ -0,0 +1,97 @@
+import copy
+import random
+
+from benchmark import generate_payload
+from cache import ResultCache, canonical_key
+
+
+def shuffled(payload, seed):
+    rnd = random.Random(seed)
+    data = copy.deepcopy(payload)
+    for key in ('staff', 'shifts', 'rules'):
+        rnd.shuffle(data[key])
+    # Key order inside the payload and its entries doesn't matter either
+    data['staff'] = [dict(reversed(list(staff.items()))) for staff in data['staff']]
+    return dict(reversed(list(data.items())))
+
+
+def test_key_ignores_list_and_field_order():
+    payload = generate_payload(0, 12)
+    assert canonical_key(shuffled(payload, 1)) == canonical_key(payload)
+    assert canonical_key(shuffled(payload, 2)) == canonical_key(payload)
+
+
+def test_key_ignores_timeout_and_defaults_weeks():
+    payload = generate_payload(0, 12)
+    payload.pop('weeks', None)
+    key = canonical_key(payload)
+    assert canonical_key(dict(payload, timeout_seconds=5)) == key
+    assert canonical_key(dict(payload, weeks=1)) == key
+
+
+def test_key_changes_with_anything_that_changes_the_rota():
+    payload = generate_payload(0, 12)
+    key = canonical_key(payload)
+
+    changed = [
+        dict(payload, seed=payload.get('seed', 0) + 1),
+        dict(payload, weeks=payload.get('weeks', 1) + 1),
+        dict(payload, boundary_state={'1': {'last_end': 1380}}),
+        dict(payload, staff=payload['staff'][1:]),
+        dict(payload, rules=[]),
+    ]
+    more_staff = copy.deepcopy(payload)
+    more_staff['shifts'][0]['staff_required'] = more_staff['shifts'][0].get('staff_required', 1) + 1
+    changed.append(more_staff)
+    fewer_hours = copy.deepcopy(payload)
+    fewer_hours['staff'][0]['contracted_hours'] -= 1
+    changed.append(fewer_hours)
+
+    keys = [canonical_key(data) for data in changed]
+    assert key not in keys
+    assert len(set(keys)) == len(keys)
+
+
+def test_only_successes_are_cached():
+    cache = ResultCache()
+    cache.put('a', {'success': False, 'error': 'timed out'})
+    cache.put('b', {'success': True})
+    assert cache.get('a') is None
+    assert cache.get('b') == {'success': True}
+    assert cache.stats()['stores'] == 1
+
+
+def searched(*statuses):
+    return {'success': True, 'stats': {'searches': [{'status': status} for status in statuses]}}
+
+
+def test_searches_cut_short_are_not_cached():
+    cache = ResultCache()
+    cache.put('optimal', searched('OPTIMAL', 'OPTIMAL'))
+    cache.put('limit', searched('OPTIMAL', 'FEASIBLE'))
+    cache.put('unknown', searched('UNKNOWN'))
+    cache.put('fallback', {**searched('OPTIMAL'), 'fallback': True})
+    assert cache.get('optimal') is not None
+    assert cache.get('limit') is None
+    assert cache.get('unknown') is None
+    assert cache.get('fallback') is None
+
+
+def test_entries_expire_and_evict():
+    cache = ResultCache(max_entries=2, ttl_seconds=0)
+    cache.put('a', {'success': True})
+    cache._entries['a'] = (0, {'success': True})
+    assert cache.get('a') is None
+
+    cache = ResultCache(max_entries=2)
+    for key in 'abc':
+        cache.put(key, {'success': True, 'key': key})
+    assert cache.get('a') is None
+    assert cache.get('c') == {'success': True, 'key': 'c'}
+    assert cache.stats()['evictions'] == 1
+
+
+def test_sqlite_store_survives_a_new_cache(tmp_path):
+    db_path = str(tmp_path / 'results.db')
+    ResultCache(db_path=db_path).put('a', {'success': True, 'schedule': []})
+    assert ResultCache(db_path=db_path).get('a') == {'success': True, 'schedule': []}
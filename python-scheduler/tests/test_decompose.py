@@ -0,0 +1,58 @@
+import threading
+import time
+
+from benchmark import generate_payload
+from scheduler import ShiftlyScheduler, parse_time
+
+
+def split_site(seed, staff_per_group):
+    """Morning-only and afternoon-only staff with their own shifts: two independent groups."""
+    morning = generate_payload(seed, staff_per_group)
+    afternoon = generate_payload(seed + 100, staff_per_group)
+    morning['shifts'] = [s for s in morning['shifts'] if parse_time(s['start_time']) < 12 * 60]
+    afternoon['shifts'] = [s for s in afternoon['shifts'] if parse_time(s['start_time']) >= 12 * 60]
+    for group, prefix, am in ((morning['staff'], 'am', True), (afternoon['staff'], 'pm', False)):
+        for staff in group:
+            staff['id'] = f"{prefix}{staff['id']}"
+            staff['name'] = f"{prefix.upper()} {staff['name']}"
+            staff['availability'] = {day: {'AM': am, 'PM': not am} for day in staff['availability']}
+            # Half the shifts, so roughly half the hours
+            half = staff['contracted_hours'] // 2
+            staff['contracted_hours'] = half - half % 8
+    return {**morning, 'staff': morning['staff'] + afternoon['staff'], 'shifts': morning['shifts'] + afternoon['shifts']}
+
+
+def test_split_site_matches_monolithic_solve():
+    payload = split_site(0, 10)
+    split = ShiftlyScheduler(dict(payload)).solve(timeout_seconds=10)
+    whole = ShiftlyScheduler(dict(payload, decompose=False)).solve(timeout_seconds=10)
+    assert split['success'] and whole['success']
+    assert split['stats']['components'] == 2
+    assert len(split['schedule'][0]['shifts']) == len(whole['schedule'][0]['shifts'])
+
+
+def test_one_group_fails_on_its_own():
+    payload = split_site(0, 10)
+    payload['staff'][0]['contracted_hours'] = payload['staff'][0]['max_hours'] = 200
+    scheduler = ShiftlyScheduler(payload)
+    # Past the site-wide screen, so the group's own solve has to fail
+    scheduler.preflight = lambda: None
+    result = scheduler.solve(timeout_seconds=10)
+    assert not result['success']
+    failed, solved = result['components']
+    assert not failed['success'] and failed['error']
+    assert solved['success'] and solved['schedule']
+
+
+def test_cancel_reaches_component_solves():
+    scheduler = ShiftlyScheduler(dict(split_site(0, 80), soft_constraints=True))
+    result = {}
+    worker = threading.Thread(target=lambda: result.update(scheduler.solve(timeout_seconds=30)))
+    worker.start()
+    while worker.is_alive() and not scheduler._active_components:
+        time.sleep(0.01)
+    scheduler.cancel()
+    cancelled_at = time.monotonic()
+    worker.join()
+    assert time.monotonic() - cancelled_at < 1.0
+    assert result['cancelled']
@@ -0,0 +1,54 @@
+import threading
+import time
+
+from benchmark import generate_payload
+from cache import ResultCache
+from jobs import JobQueue
+from scheduler import ShiftlyScheduler
+
+
+def wait_for(queue, job_id, timeout=10):
+    end = time.time() + timeout
+    while time.time() < end:
+        job = queue.get(job_id)
+        if job['status'] not in ('queued', 'running'):
+            return job
+        time.sleep(0.02)
+    raise AssertionError(f'job {job_id} still {job["status"]}')
+
+
+def test_polls_are_not_held_up_by_a_slow_submit(monkeypatch):
+    queue = JobQueue(result_cache=ResultCache())
+    done_id = queue.submit(generate_payload(0, 8), timeout_seconds=10)
+    wait_for(queue, done_id)
+
+    entered = threading.Event()
+    release = threading.Event()
+    original = ShiftlyScheduler.preflight
+
+    def slow_preflight(self):
+        entered.set()
+        release.wait(5)
+        return original(self)
+
+    monkeypatch.setattr(ShiftlyScheduler, 'preflight', slow_preflight)
+    submitter = threading.Thread(target=queue.submit, args=(generate_payload(1, 8), 10))
+    submitter.start()
+    try:
+        assert entered.wait(5)
+        started = time.time()
+        assert queue.get(done_id)['status'] == 'succeeded'
+        assert time.time() - started < 0.5
+    finally:
+        release.set()
+        submitter.join()
+
+
+def test_cached_result_skips_the_solver():
+    queue = JobQueue(result_cache=ResultCache())
+    payload = generate_payload(0, 8)
+    first = wait_for(queue, queue.submit(payload, timeout_seconds=10))
+    assert first['status'] == 'succeeded'
+
+    second_id = queue.submit(payload, timeout_seconds=10)
+    assert queue.get(second_id)['status'] == 'succeeded'
@@ -0,0 +1,47 @@
+import pytest
+
+from benchmark import generate_payload
+from scheduler import DAY_ORDER, ShiftlyScheduler
+
+
+def weekend_payload(multi_week_mode):
+    """Four staff, one never available at weekends, and every weekend slot needing the other three."""
+    staff = [
+        {
+            'id': f's{i}',
+            'name': f'Staff {i}',
+            'contracted_hours': 16,
+            'max_hours': 40,
+            'availability': {day.lower(): True for day in DAY_ORDER},
+        }
+        for i in range(4)
+    ]
+    staff[3]['availability'].update({'saturday': False, 'sunday': False})
+    shifts = [
+        {'name': 'Day', 'day': day, 'start_time': '09:00', 'end_time': '17:00', 'staff_required': 3 if day in ('Saturday', 'Sunday') else 1}
+        for day in DAY_ORDER
+    ]
+    return {
+        'staff': staff,
+        'shifts': shifts,
+        'rules': [{'type': 'fair_weekend_distribution', 'enabled': True}],
+        'weeks': 3,
+        'multi_week_mode': multi_week_mode,
+    }
+
+
+@pytest.mark.parametrize('multi_week_mode', ['sequential', 'joint'])
+def test_staff_without_weekends_dont_block_weekend_fairness(multi_week_mode):
+    result = ShiftlyScheduler(weekend_payload(multi_week_mode)).solve(timeout_seconds=10)
+    assert result['success'], result.get('error')
+    assert len(result['schedule']) == 3
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_joint_solves_whatever_sequential_solves(seed):
+    payload = generate_payload(seed, 10, weeks=2)
+    sequential = ShiftlyScheduler(dict(payload, multi_week_mode='sequential')).solve(timeout_seconds=10)
+    joint = ShiftlyScheduler(dict(payload, multi_week_mode='joint')).solve(timeout_seconds=10)
+    if sequential['success']:
+        assert joint['success'], joint.get('error')
+        assert [week['week'] for week in joint['schedule']] == [1, 2]
@@ -0,0 +1,78 @@
+import copy
+
+import pytest
+
+from benchmark import generate_payload
+from scheduler import DAY_ORDER, ShiftlyScheduler
+
+RULES = [{'type': 'minimum_days_off', 'enabled': True, 'value': 2}]
+
+
+def payload(staff_hours, shifts_per_day=2, staff_required=1, shift_hours=8):
+    shifts = [
+        {
+            'name': f'Shift {n}', 'day': day, 'start_time': f'{6 + n * shift_hours:02d}:00',
+            'end_time': f'{6 + (n + 1) * shift_hours:02d}:00', 'staff_required': staff_required,
+        }
+        for day in DAY_ORDER for n in range(shifts_per_day)
+    ]
+    staff = [
+        {
+            'id': f's{i}', 'name': f'Staff {i}', 'contracted_hours': hours, 'max_hours': max(hours, 40),
+            'availability': {day.lower(): True for day in DAY_ORDER},
+        }
+        for i, hours in enumerate(staff_hours)
+    ]
+    return {'staff': staff, 'shifts': shifts, 'rules': RULES}
+
+
+def with_staff(data, index, **changes):
+    data['staff'][index].update(changes)
+    return data
+
+
+INFEASIBLE = {
+    # Three people per shift, only two staff
+    'coverage': payload([16, 16], staff_required=3),
+    # 40h from two available days
+    'staff_availability': with_staff(payload([40, 24, 24]), 0, availability={
+        day.lower(): day in ('Monday', 'Tuesday') for day in DAY_ORDER
+    }),
+    # 6h shifts can't make 19-20h
+    'contract_lengths': with_staff(payload([20, 24, 24, 12], shift_hours=6), 0, max_hours=20),
+    # 14 shifts of 8h against two people capped at 40h
+    'capacity': payload([8, 8]),
+    # Contracts well beyond the 112h of shifts
+    'contracted_hours': payload([40, 40, 40, 40]),
+}
+
+
+def model_solves(data, monkeypatch):
+    with monkeypatch.context() as patch:
+        patch.setattr(ShiftlyScheduler, 'preflight', lambda self: None)
+        return ShiftlyScheduler(copy.deepcopy(data)).solve(timeout_seconds=10)['success']
+
+
+@pytest.mark.parametrize('check', sorted(INFEASIBLE))
+def test_rejects_known_infeasible_input(check, monkeypatch):
+    data = INFEASIBLE[check]
+    rejection = ShiftlyScheduler(copy.deepcopy(data)).preflight()
+    assert rejection is not None
+    assert check in {diagnostic['check'] for diagnostic in rejection['diagnostics']}
+    assert rejection['error'].startswith('Cannot generate this rota')
+    # Every rejection has to be one the full model agrees with
+    assert not model_solves(data, monkeypatch)
+
+
+def test_soft_mode_never_rejects():
+    for data in INFEASIBLE.values():
+        assert ShiftlyScheduler(dict(data, soft_constraints=True)).preflight() is None
+
+
+@pytest.mark.parametrize('seed', range(8))
+def test_no_false_positives_on_benchmark_cases(seed, monkeypatch):
+    data = generate_payload(seed, 15)
+    if ShiftlyScheduler(copy.deepcopy(data)).preflight() is not None:
+        assert not model_solves(data, monkeypatch)
+    else:
+        assert ShiftlyScheduler(copy.deepcopy(data)).solve(timeout_seconds=10)['success']
@@ -0,0 +1,65 @@
+from itertools import combinations_with_replacement
+
+import pytest
+
+from scheduler import HoursReachability, ShiftCatalogue
+
+DURATION_SETS = [
+    [480],
+    [360, 480],
+    [240, 450, 600],
+    [300, 420, 510, 720],
+]
+
+
+def brute_force_totals(durations, max_shifts):
+    totals = {0}
+    for count in range(1, max_shifts + 1):
+        for combo in combinations_with_replacement(durations, count):
+            totals.add(sum(combo))
+    return totals
+
+
+@pytest.mark.parametrize('durations', DURATION_SETS)
+@pytest.mark.parametrize('max_shifts', [3, 7])
+def test_can_build_matches_enumeration(durations, max_shifts):
+    reachability = HoursReachability(durations, max_shifts=7)
+    totals = sorted(brute_force_totals(durations, max_shifts))
+
+    # Contract windows of an hour either side, as the hours checks use them
+    for hours in range(0, 61):
+        low, high = hours * 60 - 60, hours * 60 + 60
+        expected = any(low <= total <= high for total in totals)
+        assert reachability.can_build(low, high, max_shifts=max_shifts) == expected, (hours, durations)
+
+    for total in range(0, reachability.limit + 1, 30):
+        assert reachability.can_build(total, total, max_shifts=max_shifts) == (total in totals)
+
+
+@pytest.mark.parametrize('durations', DURATION_SETS)
+def test_closest_matches_enumeration(durations):
+    reachability = HoursReachability(durations, max_shifts=7)
+    totals = sorted(brute_force_totals(durations, 7))
+    for target in range(0, reachability.limit + 200, 45):
+        expected = min(totals, key=lambda total: (abs(total - target), total))
+        assert reachability.closest(target) == expected, (target, durations)
+
+
+def test_unreachable_contracts():
+    # Only 8h shifts: 20h is out of reach, 16h and 24h are fine
+    reachability = HoursReachability([480])
+    assert not reachability.can_build(19 * 60, 21 * 60)
+    assert reachability.can_build(15 * 60, 17 * 60)
+    # 64h needs eight 8h shifts, one more than a week allows
+    assert not reachability.can_build(63 * 60, 65 * 60)
+    assert reachability.closest(20 * 60) == 16 * 60
+
+
+def test_catalogue_reuses_one_table_per_duration_set():
+    catalogue = ShiftCatalogue([
+        {'day': 'Monday', 'start_time': '09:00', 'end_time': '17:00'},
+        {'day': 'Monday', 'start_time': '18:00', 'end_time': '02:00'},
+        {'day': 'Tuesday', 'start_time': '09:00', 'end_time': '15:00'},
+    ])
+    assert catalogue.reachability().durations == [360, 480]
+    assert catalogue.reachability() is catalogue.reachability([480, 360, 480])
@@ -0,0 +1,72 @@
+from scheduler import DAY_ORDER, ShiftCatalogue, ShiftlyScheduler, validate_schedule
+
+REST_RULES = [{'type': 'rest_between_shifts', 'enabled': True, 'value': 11}]
+
+# After Close, Mid leaves exactly 11h of rest and Open only 8h
+TEMPLATES = [('Open', '07:00', '15:00'), ('Mid', '10:00', '18:00'), ('Close', '15:00', '23:00')]
+
+
+def week_of_shifts(days=DAY_ORDER):
+    return [
+        {'name': name, 'day': day, 'start_time': start, 'end_time': end, 'staff_required': 1}
+        for day in days for name, start, end in TEMPLATES
+    ]
+
+
+def staff(count, contracted_hours):
+    return [
+        {
+            'id': f's{i}', 'name': f'Staff {i}', 'contracted_hours': contracted_hours, 'max_hours': 48,
+            'availability': {day.lower(): True for day in DAY_ORDER},
+        }
+        for i in range(count)
+    ]
+
+
+def test_rest_conflicts_include_only_pairs_below_the_minimum():
+    shifts = week_of_shifts()
+    catalogue = ShiftCatalogue(shifts)
+    conflicts = catalogue.rest_conflicts(11 * 60)
+
+    def index(day, name):
+        return next(i for i, s in enumerate(shifts) if s['day'] == day and s['name'] == name)
+
+    assert conflicts[index('Monday', 'Close')] == {index('Tuesday', 'Open')}
+    assert index('Monday', 'Mid') not in conflicts
+    assert index('Monday', 'Open') not in conflicts
+    # Sunday runs into the following Monday
+    assert conflicts[index('Sunday', 'Close')] == {index('Monday', 'Open')}
+
+
+def test_solved_rota_with_tight_pairs_passes_the_validator():
+    payload = {'staff': staff(5, 32), 'shifts': week_of_shifts(), 'rules': REST_RULES}
+    result = ShiftlyScheduler(payload).solve(timeout_seconds=10)
+    assert result['success'], result.get('error')
+
+    report = validate_schedule(result['schedule'], REST_RULES, payload['staff'])
+    rest = next(entry for entry in report if entry['rule'].startswith('Overnight Rest'))
+    assert rest['status'] == 'followed', rest['violations']
+
+
+def one_person_pair(next_name):
+    # One person must cover Monday's Close and the next morning's shift
+    shifts = [s for s in week_of_shifts(['Monday']) if s['name'] == 'Close']
+    shifts += [s for s in week_of_shifts(['Tuesday']) if s['name'] == next_name]
+    return {'staff': staff(1, 16), 'shifts': shifts, 'rules': REST_RULES}
+
+
+def test_pair_at_exactly_the_minimum_is_allowed_by_model_and_validator():
+    result = ShiftlyScheduler(one_person_pair('Mid')).solve(timeout_seconds=10)
+    assert result['success'], result.get('error')
+    rest = next(entry for entry in result['rule_compliance'] if entry['rule'].startswith('Overnight Rest'))
+    assert rest['status'] == 'followed'
+
+
+def test_conflicting_pair_is_forbidden(monkeypatch):
+    # Leave it to the model rather than the preflight screen
+    monkeypatch.setattr(ShiftlyScheduler, 'preflight', lambda self: None)
+    payload = one_person_pair('Open')
+    assert not ShiftlyScheduler(payload).solve(timeout_seconds=10)['success']
+
+    relaxed = dict(payload, rules=[{'type': 'rest_between_shifts', 'enabled': False}])
+    assert ShiftlyScheduler(relaxed).solve(timeout_seconds=10)['success']
@@ -0,0 +1,26 @@
+import pytest
+
+from benchmark import generate_payload
+from scheduler import ShiftlyScheduler
+
+
+@pytest.mark.parametrize('multi_week_mode', ['sequential', 'joint'])
+def test_soft_mode_returns_a_rota_when_time_runs_out(multi_week_mode):
+    payload = dict(generate_payload(0, 60, weeks=2, multi_week_mode=multi_week_mode), soft_constraints=True)
+    result = ShiftlyScheduler(payload).solve(timeout_seconds=0.3)
+    assert result['success'], result.get('error')
+    assert result['fallback'] and result['status'] == 'UNKNOWN'
+    assert 'diagnostics' not in result
+    assert len(result['schedule']) == 2
+    assert result['penalty'] == sum(violation['penalty'] for violation in result['violations'])
+
+
+def test_timed_out_soft_solve_is_not_served_from_the_cache():
+    from app import app
+    
+    client = app.test_client()
+    payload = dict(generate_payload(1, 60, weeks=2), soft_constraints=True, timeout_seconds=0.3)
+    for _ in range(2):
+        response = client.post('/schedule', json=payload)
+        assert response.get_json()['fallback']
+        assert response.headers['X-Cache'] == 'MISS'
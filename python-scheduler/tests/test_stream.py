@@ -0,0 +1,25 @@
+import json
+
+import pytest
+
+from app import app
+from benchmark import generate_payload
+
+
+@pytest.mark.parametrize('payload', [
+    dict(generate_payload(0, 8), timeout_seconds='soon'),
+    dict(generate_payload(0, 8), shifts=[{'day': 'Monday', 'name': 'No times'}]),
+    {'staff': [{'name': 'No id'}], 'shifts': [], 'rules': []},
+])
+def test_bad_stream_request_is_a_json_400(payload):
+    response = app.test_client().post('/schedule/stream', json=payload)
+    assert response.status_code == 400
+    assert response.get_json()['success'] is False
+
+
+def test_stream_ends_with_the_result():
+    response = app.test_client().post('/schedule/stream', json=dict(generate_payload(0, 8), timeout_seconds=10))
+    assert response.status_code == 200
+    events = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert events[-1]['event'] == 'result'
+    assert events[-1]['success'], events[-1].get('error')
@@ -0,0 +1,68 @@
+import pytest
+
+from benchmark import RULES, generate_payload
+from scheduler import DAY_ORDER, ShiftlyScheduler
+
+
+def identical_staff_payload(count=5, hours=16):
+    shifts = [
+        {'name': name, 'day': day, 'start_time': start, 'end_time': end, 'staff_required': 1}
+        for day in DAY_ORDER
+        for name, start, end in [('Open', '07:00', '15:00'), ('Close', '15:00', '23:00')]
+    ]
+    staff = [
+        {
+            'id': f's{i}', 'name': f'Staff {i}', 'contracted_hours': hours, 'max_hours': 40,
+            'availability': {day.lower(): True for day in DAY_ORDER},
+        }
+        for i in range(count)
+    ]
+    # One odd one out, who stays out of the class
+    staff.append(dict(staff[0], id='other', name='Other', contracted_hours=8))
+    return {'staff': staff, 'shifts': shifts, 'rules': RULES}
+
+
+def solve(payload):
+    result = ShiftlyScheduler(payload).solve(timeout_seconds=20)
+    search = result['stats']['searches'][0] if result.get('success') else None
+    return result, search
+
+
+def test_identical_staff_form_one_class():
+    scheduler = ShiftlyScheduler(identical_staff_payload())
+    assert scheduler._interchangeable_staff() == [list(range(5))]
+
+
+def test_ordering_keeps_the_rota_and_its_cost(monkeypatch):
+    payload = identical_staff_payload()
+    # Only the odd one out has history, so the class survives and there is a cost to minimise
+    payload['previous_schedule'] = [{'week': 1, 'shifts': [
+        {'day': 'Monday', 'shift_name': 'Open', 'start_time': '07:00', 'end_time': '15:00', 'staff_id': 'other'},
+        {'day': 'Tuesday', 'shift_name': 'Close', 'start_time': '15:00', 'end_time': '23:00', 'staff_id': 'other'},
+    ]}]
+    payload['minimise_changes'] = True
+    assert ShiftlyScheduler(payload)._interchangeable_staff() == [list(range(5))]
+
+    result, search = solve(payload)
+    assert result['success'], result.get('error')
+
+    minutes = {}
+    for shift in result['schedule'][0]['shifts']:
+        minutes[shift['staff_name']] = minutes.get(shift['staff_name'], 0) + 480
+    ordered = [minutes.get(f'Staff {i}', 0) for i in range(5)]
+    assert ordered == sorted(ordered, reverse=True)
+
+    monkeypatch.setattr(ShiftlyScheduler, '_add_symmetry_breaking', lambda self, *args, **kwargs: None)
+    unbroken, unbroken_search = solve(payload)
+    assert unbroken['success']
+    assert search['status'] == unbroken_search['status'] == 'OPTIMAL'
+    assert search['objective'] == unbroken_search['objective']
+
+
+@pytest.mark.parametrize('seed', range(4))
+def test_benchmark_feasibility_is_unchanged(seed, monkeypatch):
+    payload = generate_payload(seed, 20)
+    with_ordering, _ = solve(payload)
+    monkeypatch.setattr(ShiftlyScheduler, '_add_symmetry_breaking', lambda self, *args, **kwargs: None)
+    without, _ = solve(payload)
+    assert with_ordering['success'] == without['success']
@@ -0,0 +1,41 @@
+import sqlite3
+
+from tuning import MIN_SAMPLES, SolveProfile, SolverTuner
+
+
+def record_fast_plain_searches(tuner, variables):
+    for _ in range(MIN_SAMPLES + 1):
+        tuning = tuner.tune(variables, False, 30, 8)
+        tuner.record(tuning, 0.08, 100, True, False)
+
+
+def test_plain_searches_dont_cap_optimisation():
+    tuner = SolverTuner(SolveProfile(), cores=4)
+    record_fast_plain_searches(tuner, 2000)
+    assert tuner.tune(2000, True, 30, 8, soft=True)['max_time_in_seconds'] == 30
+    assert tuner.tune(2000, True, 30, 8)['max_time_in_seconds'] == 30
+
+
+def test_optimisation_history_caps_its_own_kind():
+    tuner = SolverTuner(SolveProfile(), cores=4)
+    for _ in range(MIN_SAMPLES + 1):
+        tuning = tuner.tune(2000, True, 30, 8, soft=True)
+        tuner.record(tuning, 0.5, 1000, True, False)
+    assert tuner.tune(2000, True, 30, 8, soft=True)['max_time_in_seconds'] == 1.5
+    assert tuner.tune(2000, True, 30, 8)['max_time_in_seconds'] == 30
+
+
+def test_profile_without_kinds_is_upgraded(tmp_path):
+    db_path = str(tmp_path / 'profile.db')
+    with sqlite3.connect(db_path) as conn:
+        conn.execute(
+            'CREATE TABLE solve_profile (bucket INTEGER NOT NULL, recorded_at REAL NOT NULL, wall_time REAL NOT NULL, '
+            'branches INTEGER NOT NULL, optimal INTEGER NOT NULL, hit_limit INTEGER NOT NULL)'
+        )
+        conn.execute('INSERT INTO solve_profile VALUES (10, 1.0, 0.08, 100, 1, 0)')
+    conn.close()
+    
+    profile = SolveProfile(db_path)
+    assert profile.summary(10, 'feasibility') is None
+    profile.record(10, 'soft', 0.5, 1000, True, False)
+    assert SolveProfile(db_path).summary(10, 'soft')['samples'] == 1
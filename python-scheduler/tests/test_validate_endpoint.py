@@ -0,0 +1,87 @@
+import pytest
+
+from app import app
+from test_validator import shift
+
+RULES = [
+    {'type': 'no_clopening', 'enabled': True},
+    {'type': 'minimum_days_off', 'enabled': True, 'value': 2},
+]
+
+CLOPENING_ROTA = [{'week': 1, 'shifts': [
+    shift('Alice', 'Monday', 'Close'),
+    shift('Alice', 'Tuesday', 'Open'),
+    shift('Bob', 'Monday', 'Mid'),
+]}]
+
+CLEAN_ROTA = [{'week': 1, 'shifts': [
+    shift('Alice', 'Monday', 'Open'),
+    shift('Bob', 'Tuesday', 'Close'),
+]}]
+
+
+def post(payload):
+    return app.test_client().post('/validate', json=payload)
+
+
+def test_single_rota_report_shape():
+    response = post({'schedule': CLOPENING_ROTA, 'rules': RULES})
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['success']
+
+    report = {entry['rule']: entry for entry in body['rule_compliance']}
+    assert list(report) == ['No Double Shifts', 'No Clopening', 'Minimum 2 Days Off']
+    for entry in report.values():
+        assert set(entry) == {'rule', 'status', 'details', 'violations'}
+
+    assert report['No Double Shifts']['status'] == 'followed'
+    assert report['No Clopening']['status'] == 'compromised'
+    assert report['No Clopening']['violations'] == [{
+        'staff': 'Alice',
+        'day': 'Monday-Tuesday',
+        'week': 'Week 1',
+        'issue': 'Closing shift (Close) followed by opening shift (Open)',
+        'solution': "Swap Tuesday's Open with another staff member",
+    }]
+
+
+def test_batch_uses_top_level_rules_unless_a_rota_sets_its_own():
+    response = post({
+        'rules': RULES,
+        'rotas': [
+            {'schedule': CLOPENING_ROTA},
+            {'schedule': CLEAN_ROTA},
+            {'schedule': CLOPENING_ROTA, 'rules': []},
+        ],
+    })
+    assert response.status_code == 200
+    results = response.get_json()['results']
+    assert len(results) == 3
+
+    statuses = [
+        {entry['rule']: entry['status'] for entry in result['rule_compliance']}
+        for result in results
+    ]
+    assert statuses[0]['No Clopening'] == 'compromised'
+    assert statuses[1]['No Clopening'] == 'followed'
+    assert 'No Clopening' not in statuses[2]
+
+
+def test_staff_list_checks_staff_without_shifts():
+    response = post({'schedule': CLEAN_ROTA, 'rules': RULES, 'staff': [{'name': 'Alice'}, {'name': 'Bob'}, {'name': 'Cara'}]})
+    report = {entry['rule']: entry for entry in response.get_json()['rule_compliance']}
+    assert report['Minimum 2 Days Off']['status'] == 'followed'
+
+
+@pytest.mark.parametrize('payload', [
+    {},
+    {'rules': RULES},
+    {'schedule': [{'week': 1}]},
+    {'schedule': [{'week': 1, 'shifts': [{'day': 'Monday'}]}]},
+    {'rotas': [{'rules': RULES}]},
+])
+def test_malformed_input_is_a_400(payload):
+    response = post(payload)
+    assert response.status_code == 400
+    assert response.get_json()['success'] is False
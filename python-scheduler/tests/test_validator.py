@@ -0,0 +1,118 @@
+import random
+
+from scheduler import DAY_ORDER, ComplianceValidator
+
+SHIFTS = {
+    'Open': ('06:00', '14:00'),
+    'Mid': ('10:00', '18:00'),
+    'Close': ('15:00', '23:00'),
+    'Late': ('18:00', '02:00'),
+}
+
+RULES = [
+    {'type': 'no_clopening', 'enabled': True},
+    {'type': 'minimum_days_off', 'enabled': True, 'value': 2},
+]
+
+
+def shift(staff_name, day, shift_name, week=1):
+    start_time, end_time = SHIFTS[shift_name]
+    return {
+        'week': week, 'day': day, 'shift_name': shift_name,
+        'start_time': start_time, 'end_time': end_time,
+        'staff_id': staff_name, 'staff_name': staff_name,
+    }
+
+
+def violations(report, rule):
+    entry = next(entry for entry in report if entry['rule'] == rule)
+    return [(v['staff'], v['day'], v['week']) for v in entry['violations']]
+
+
+def test_double_shifts_follow_first_appearance_in_shift_list():
+    # Alice is listed first, but Bob's Tuesday pair appears before Alice's Monday pair
+    schedule = [{'week': 1, 'shifts': [
+        shift('Alice', 'Wednesday', 'Open'),
+        shift('Bob', 'Tuesday', 'Open'),
+        shift('Alice', 'Monday', 'Open'),
+        shift('Bob', 'Tuesday', 'Close'),
+        shift('Alice', 'Monday', 'Close'),
+    ]}]
+    report = ComplianceValidator([{'name': 'Alice'}, {'name': 'Bob'}], RULES).validate(schedule)
+    assert violations(report, 'No Double Shifts') == [
+        ('Bob', 'Tuesday', 'Week 1'),
+        ('Alice', 'Monday', 'Week 1'),
+    ]
+
+
+def test_clopening_follows_day_then_shift_list_order():
+    schedule = [{'week': 1, 'shifts': [
+        shift('Alice', 'Wednesday', 'Close'),
+        shift('Alice', 'Thursday', 'Open'),
+        shift('Bob', 'Monday', 'Close'),
+        shift('Alice', 'Monday', 'Late'),
+        shift('Alice', 'Tuesday', 'Open'),
+        shift('Bob', 'Tuesday', 'Open'),
+    ]}]
+    report = ComplianceValidator([{'name': 'Alice'}, {'name': 'Bob'}], RULES).validate(schedule)
+    assert violations(report, 'No Clopening') == [
+        ('Bob', 'Monday-Tuesday', 'Week 1'),
+        ('Alice', 'Monday-Tuesday', 'Week 1'),
+        ('Alice', 'Wednesday-Thursday', 'Week 1'),
+    ]
+
+
+def test_days_off_follow_roster_order():
+    schedule = [{'week': 1, 'shifts': [
+        shift(name, day, 'Mid') for name in ('Bob', 'Alice') for day in DAY_ORDER[:6]
+    ]}]
+    report = ComplianceValidator([{'name': 'Alice'}, {'name': 'Bob'}], RULES).validate(schedule)
+    assert violations(report, 'Minimum 2 Days Off') == [
+        ('Alice', 'Full week', 'Week 1'),
+        ('Bob', 'Full week', 'Week 1'),
+    ]
+
+
+def reference_double_shifts(schedule):
+    # One grouping pass per week, as the per-rule check did before the single-pass validator
+    found = []
+    for week_data in schedule:
+        groups = {}
+        for s in week_data['shifts']:
+            groups.setdefault((s['staff_name'], s['day']), []).append(s)
+        for (staff_name, day), shifts in groups.items():
+            if len(shifts) > 1:
+                found.append((staff_name, day, f"Week {week_data['week']}"))
+    return found
+
+
+def reference_clopening(schedule):
+    found = []
+    for week_data in schedule:
+        by_day = {}
+        for s in week_data['shifts']:
+            by_day.setdefault(s['day'], []).append(s)
+        for day, next_day in zip(DAY_ORDER, DAY_ORDER[1:]):
+            for closing in by_day.get(day, []):
+                if closing['shift_name'] not in ('Close', 'Late'):
+                    continue
+                for opening in by_day.get(next_day, []):
+                    if opening['shift_name'] == 'Open' and opening['staff_name'] == closing['staff_name']:
+                        found.append((closing['staff_name'], f"{day}-{next_day}", f"Week {week_data['week']}"))
+    return found
+
+
+def test_single_pass_matches_per_rule_order_on_random_rotas():
+    rnd = random.Random(0)
+    names = [f'Staff {i}' for i in range(6)]
+    for _ in range(50):
+        schedule = [
+            {'week': week, 'shifts': [
+                shift(rnd.choice(names), rnd.choice(DAY_ORDER), rnd.choice(list(SHIFTS)), week)
+                for _ in range(rnd.randint(5, 40))
+            ]}
+            for week in (1, 2)
+        ]
+        report = ComplianceValidator([{'name': name} for name in names], RULES).validate(schedule)
+        assert violations(report, 'No Double Shifts') == reference_double_shifts(schedule)
+        assert violations(report, 'No Clopening') == reference_clopening(schedule)
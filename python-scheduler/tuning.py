@@ -0,0 +1,174 @@
+"""Pick CP-SAT parameters from the size of the model and past solves of that size."""
+
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+
+# Models below these variable counts are small / medium; anything larger is large
+SMALL_MODEL_VARIABLES = 500
+MEDIUM_MODEL_VARIABLES = 5000
+
+# Optimal solves of a bucket needed to trust its history, and how many are kept
+MIN_SAMPLES = 5
+MAX_SAMPLES = 50
+
+
+def available_cores():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def size_bucket(variables):
+    return max(0, int(math.log2(max(1, variables))))
+
+
+def solve_kind(has_objective, soft=False):
+    if soft:
+        return 'soft'
+    return 'optimise' if has_objective else 'feasibility'
+
+
+class SolveProfile:
+    """Recent search outcomes per size bucket and kind, optionally backed by SQLite."""
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path
+        self._samples = defaultdict(lambda: deque(maxlen=MAX_SAMPLES))
+        self._lock = threading.Lock()
+
+        if db_path:
+            with self._connect() as conn:
+                conn.execute(
+                    'CREATE TABLE IF NOT EXISTS solve_profile '
+                    '(bucket INTEGER NOT NULL, recorded_at REAL NOT NULL, wall_time REAL NOT NULL, '
+                    'branches INTEGER NOT NULL, optimal INTEGER NOT NULL, hit_limit INTEGER NOT NULL, kind TEXT)'
+                )
+                # Profiles written before kinds were recorded; their rows mix kinds and are skipped
+                columns = [row[1] for row in conn.execute('PRAGMA table_info(solve_profile)')]
+                if 'kind' not in columns:
+                    conn.execute('ALTER TABLE solve_profile ADD COLUMN kind TEXT')
+                rows = conn.execute(
+                    'SELECT bucket, kind, wall_time, branches, optimal, hit_limit FROM solve_profile '
+                    'WHERE kind IS NOT NULL ORDER BY recorded_at'
+                ).fetchall()
+            for bucket, kind, wall_time, branches, optimal, hit_limit in rows:
+                self._samples[bucket, kind].append((wall_time, branches, bool(optimal), bool(hit_limit)))
+
+    def record(self, bucket, kind, wall_time, branches, optimal, hit_limit):
+        sample = (wall_time, branches, optimal, hit_limit)
+        with self._lock:
+            self._samples[bucket, kind].append(sample)
+        if self.db_path:
+            now = time.time()
+            with self._connect() as conn:
+                conn.execute(
+                    'INSERT INTO solve_profile (bucket, kind, recorded_at, wall_time, branches, optimal, hit_limit) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    (bucket, kind, now, wall_time, branches, int(optimal), int(hit_limit)),
+                )
+                # Keep only the newest MAX_SAMPLES rows per bucket and kind
+                conn.execute(
+                    'DELETE FROM solve_profile WHERE bucket = ? AND kind = ? AND recorded_at < ('
+                    'SELECT MIN(recorded_at) FROM (SELECT recorded_at FROM solve_profile '
+                    'WHERE bucket = ? AND kind = ? ORDER BY recorded_at DESC LIMIT ?))',
+                    (bucket, kind, bucket, kind, MAX_SAMPLES),
+                )
+
+    def summary(self, bucket, kind):
+        """{'samples', 'optimal_p90', 'limit_rate', 'mean_branches'} for a bucket and kind, or None."""
+        with self._lock:
+            samples = list(self._samples.get((bucket, kind), ()))
+        if not samples:
+            return None
+        optimal_times = sorted(wall_time for wall_time, _, optimal, _ in samples if optimal)
+        p90 = optimal_times[int(0.9 * (len(optimal_times) - 1))] if optimal_times else None
+        return {
+            'samples': len(samples),
+            'optimal_samples': len(optimal_times),
+            'optimal_p90': p90,
+            'limit_rate': sum(1 for *_, hit_limit in samples if hit_limit) / len(samples),
+            'mean_branches': sum(branches for _, branches, _, _ in samples) / len(samples),
+        }
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=5)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+
+class SolverTuner:
+
+    def __init__(self, profile=None, cores=None):
+        self.profile = profile or SolveProfile()
+        self.cores = cores or available_cores()
+
+    def tune(self, variables, has_objective, time_limit, max_workers, soft=False):
+        """CP-SAT settings for a model of this many variables, within time_limit seconds."""
+        bucket = size_bucket(variables)
+        kind = solve_kind(has_objective, soft)
+        history = self.profile.summary(bucket, kind)
+        workers = max(1, min(max_workers, self.cores))
+
+        if variables < SMALL_MODEL_VARIABLES and not has_objective:
+            num_workers = 1
+            linearization_level = 0
+            presolve_iterations = 1
+        elif variables < MEDIUM_MODEL_VARIABLES:
+            num_workers = min(4, workers)
+            linearization_level = 1
+            presolve_iterations = 3
+        else:
+            num_workers = workers
+            linearization_level = 2 if has_objective else 1
+            presolve_iterations = 3
+
+        if history is not None:
+            # This size has been running out of time: give it everything
+            if history['limit_rate'] > 0.2:
+                num_workers = workers
+                linearization_level = max(linearization_level, 1)
+            # ...or it has always been trivial, whatever its size
+            elif history['optimal_p90'] is not None and history['optimal_p90'] < 0.2 and history['mean_branches'] < 1000:
+                num_workers = 1
+
+        # Without an objective the search stops at the first rota, so the limit only
+        # matters for optimisation, which would otherwise spend all of it proving optimality.
+        # history is of this kind only, so quick plain searches never cap an optimisation
+        if has_objective and history is not None and history['optimal_samples'] >= MIN_SAMPLES:
+            time_limit = min(time_limit, max(1.0, 3 * history['optimal_p90']))
+
+        return {
+            'bucket': bucket,
+            'kind': kind,
+            'num_workers': num_workers,
+            'linearization_level': linearization_level,
+            'max_presolve_iterations': presolve_iterations,
+            'max_time_in_seconds': time_limit,
+        }
+
+    def record(self, tuning, wall_time, branches, optimal, hit_limit):
+        self.profile.record(tuning['bucket'], tuning['kind'], wall_time, branches, optimal, hit_limit)
+
+
+_default_tuner = None
+_default_tuner_lock = threading.Lock()
+
+
+def default_tuner():
+    """The process-wide tuner, so every solve learns from the ones before it."""
+    global _default_tuner
+    with _default_tuner_lock:
+        if _default_tuner is None:
+            _default_tuner = SolverTuner(SolveProfile(db_path=os.environ.get('SCHEDULER_PROFILE_DB') or None))
+        return _default_tuner